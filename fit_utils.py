@@ -0,0 +1,512 @@
+import numpy as np
+import pandas as pd
+from scipy.stats import pearsonr, spearmanr, kendalltau, rankdata
+from scipy.optimize import fmin, curve_fit
+from math import sqrt
+from sklearn.metrics import mean_squared_error
+
+
+# imported from coeff_func.py from tp2
+def logistic(t, x):
+    return 0.5 - (1 / (1 + np.exp(t * x)))
+
+
+def fitfun(t, x):
+    res = t[0] * (logistic(t[1], (x-t[2]))) + t[3] + t[4] * x
+    return res
+
+
+def errfun(t, x, y):
+    return np.sum(np.power(y - fitfun(t, x), 2))
+
+
+def RMSE(y_actual, y_predicted):
+    rmse = sqrt(mean_squared_error(y_actual, y_predicted))
+    return rmse
+
+
+def coeff_fit(Obj, y):
+    temp = pearsonr(Obj, y)
+    t = np.zeros(5)
+    t[2] = np.mean(Obj)
+    t[3] = np.mean(y)
+    t[1] = 1/np.std(Obj)
+    t[0] = abs(np.max(y) - np.min(y))
+    t[4] = -1
+    signslope = 1
+    if temp[1] <= 0:
+        t[0] *= -1
+        signslope *= -1
+    tt = fmin(errfun, t, args=(Obj, y))
+    fit = fitfun(tt, Obj)
+    cc = pearsonr(fit, y)[0]
+    srocc = spearmanr(fit, y).correlation
+    krocc = kendalltau(fit, y).correlation
+    rmse = RMSE(np.absolute(y), np.absolute(fit))
+    return fit, cc, srocc, krocc, rmse
+
+
+def logistic_func(X, b1, b2, b3, b4):
+    """
+    Standard 4-parameter logistic function for VQA mapping.
+    b1: upper bound, b2: lower bound, b3: slope, b4: midpoint
+    """
+    return b2 + (b1 - b2) / (1 + np.exp(-b3 * (X - b4)))
+
+
+def fit_metrics_to_mos(metric_values, mos_values):
+    """
+    Robustly fits metric values to MOS using curve_fit.
+    """
+    initial_guess = [5, 1, 1, np.mean(metric_values)]
+
+    try:
+        popt, _ = curve_fit(logistic_func, metric_values, mos_values,
+                            p0=initial_guess, maxfev=10000)
+        return popt
+    except Exception as e:
+        print(f"Fitting failed: {e}")
+        return initial_guess
+
+
+# ===== BATCHED FITS =====
+# Every function below works on a batch of problems at once: x and y have
+# shape (B, n) (B replicates of n stimuli) and parameters have shape (B, p).
+
+def _sigmoid(u):
+    return 0.5 * (1 + np.tanh(0.5 * u))
+
+
+def fitfun_batch(t, x):
+    """
+    fitfun evaluated for a batch of parameters t (B, 5) on x (B, n).
+    """
+    u = t[:, 1:2] * (x - t[:, 2:3])
+    return t[:, 0:1] * (0.5 - _sigmoid(-u)) + t[:, 3:4] + t[:, 4:5] * x
+
+
+def fitfun_jac(t, x):
+    """
+    Analytic Jacobian of fitfun_batch, shape (B, n, 5).
+    """
+    d = x - t[:, 2:3]
+    u = t[:, 1:2] * d
+    s = _sigmoid(-u)
+    ds = s * (1 - s)
+    return np.stack([
+        0.5 - s,
+        t[:, 0:1] * ds * d,
+        -t[:, 0:1] * ds * t[:, 1:2],
+        np.ones_like(x),
+        x,
+    ], axis=-1)
+
+
+def fitfun_init(x, y):
+    """
+    Starting point of coeff_fit, with the sign taken from the correlation.
+    """
+    xc = x - x.mean(axis=1, keepdims=True)
+    sign = np.sign((xc * (y - y.mean(axis=1, keepdims=True))).sum(axis=1))
+    sign[sign == 0] = 1
+    std = x.std(axis=1)
+    std[std == 0] = 1
+    return np.stack([
+        sign * np.abs(y.max(axis=1) - y.min(axis=1)),
+        1 / std,
+        x.mean(axis=1),
+        y.mean(axis=1),
+        -np.ones(len(x)),
+    ], axis=1)
+
+
+def logistic_func_batch(b, x):
+    """
+    logistic_func evaluated for a batch of parameters b (B, 4) on x (B, n).
+    """
+    g = _sigmoid(b[:, 2:3] * (x - b[:, 3:4]))
+    return b[:, 1:2] + (b[:, 0:1] - b[:, 1:2]) * g
+
+
+def logistic_func_jac(b, x):
+    """
+    Analytic Jacobian of logistic_func_batch, shape (B, n, 4).
+    """
+    d = x - b[:, 3:4]
+    g = _sigmoid(b[:, 2:3] * d)
+    dg = g * (1 - g) * (b[:, 0:1] - b[:, 1:2])
+    return np.stack([g, 1 - g, dg * d, -dg * b[:, 2:3]], axis=-1)
+
+
+def logistic_func_init(x, y):
+    """
+    Bounds from the MOS range, midpoint at the mean metric value.
+    """
+    xc = x - x.mean(axis=1, keepdims=True)
+    sign = np.sign((xc * (y - y.mean(axis=1, keepdims=True))).sum(axis=1))
+    sign[sign == 0] = 1
+    std = x.std(axis=1)
+    std[std == 0] = 1
+    return np.stack([y.max(axis=1), y.min(axis=1), sign / std, x.mean(axis=1)], axis=1)
+
+
+def fitfun_from_profile(c, slope, mid):
+    """
+    fitfun parameters from the coefficients c (B, 3) of [sigmoid(slope*(x-mid)), 1, x].
+    """
+    return np.stack([c[:, 0], slope, mid, c[:, 1] + c[:, 0] / 2, c[:, 2]], axis=1)
+
+
+def logistic_func_from_profile(c, slope, mid):
+    """
+    logistic_func parameters from the coefficients c (B, 2) of [sigmoid(slope*(x-mid)), 1].
+    """
+    return np.stack([c[:, 0] + c[:, 1], c[:, 1], slope, mid], axis=1)
+
+
+# model -> (function, Jacobian, starting point, midpoint index, profile basis size, from profile)
+# once the sigmoid slope and midpoint are fixed, both models are linear combinations of
+# [sigmoid, 1] (plus x for fitfun): the profile basis
+MODELS = {
+    'fitfun': (fitfun_batch, fitfun_jac, fitfun_init, 2, 3, fitfun_from_profile),
+    'logistic_func': (logistic_func_batch, logistic_func_jac, logistic_func_init, 3, 2,
+                      logistic_func_from_profile),
+}
+
+
+def linear_fit_batch(x, y):
+    """
+    Residual sum of squares of the least-squares line of each row, shape (B,).
+    """
+    xc = x - x.mean(axis=1, keepdims=True)
+    yc = y - y.mean(axis=1, keepdims=True)
+    sxx = (xc ** 2).sum(axis=1)
+    sxy = (xc * yc).sum(axis=1)
+    ratio = np.divide(sxy ** 2, sxx, out=np.zeros(len(x)), where=sxx > 0)
+    return (yc ** 2).sum(axis=1) - ratio
+
+
+class _Profile:
+    # least-squares fit of y on the profile basis for given sigmoid slopes / midpoints,
+    # from sums over the stimuli; the sums not involving the sigmoid are computed once
+
+    def __init__(self, x, y, n_terms):
+        self.x, self.y, self.n_terms = x, y, n_terms
+        self.yy = (y ** 2).sum(axis=1)
+        ones = np.ones_like(x)
+        const = [ones, x][:n_terms - 1]
+        self.cc = np.einsum('ibn,jbn->bij', const, const)
+        self.cy = np.einsum('ibn,bn->bi', const, y)
+        self.const = const
+
+    def solve(self, slope, mid):
+        sig = _sigmoid(slope[:, None] * (self.x - mid[:, None]))
+        q = self.n_terms
+        A = np.empty((len(sig), q, q))
+        A[:, 0, 0] = (sig ** 2).sum(axis=1)
+        for j, col in enumerate(self.const, 1):
+            A[:, 0, j] = A[:, j, 0] = (sig * col).sum(axis=1)
+        A[:, 1:, 1:] = self.cc
+        b = np.concatenate([(sig * self.y).sum(axis=1)[:, None], self.cy], axis=1)
+        ridge = 1e-10 * np.einsum('bii->b', A)[:, None, None] * np.eye(q)
+        c = np.linalg.solve(A + ridge, b[..., None])[..., 0]
+        return c, np.maximum(self.yy - (c * b).sum(axis=1), 0)
+
+
+def _grid_starts(profile, from_profile, n_starts=4, n_slopes=8):
+    # starts from a grid of (slope, midpoint) with the other parameters solved exactly; the
+    # midpoints are the x values and halfway between them, so sharp steps can be placed
+    # anywhere in the data; returns the best slope of the n_starts best midpoints (n_starts, B, p)
+    x = profile.x
+    std = x.std(axis=1)
+    std[std == 0] = 1
+    xs = np.sort(x, axis=1)
+    mids = np.concatenate([xs, (xs[:, 1:] + xs[:, :-1]) / 2], axis=1).T
+    slopes = np.geomspace(0.3, 3000, n_slopes)
+    coefs = np.empty((n_slopes, len(mids), len(x), profile.n_terms))
+    sse = np.empty((n_slopes, len(mids), len(x)))
+    for i, k in enumerate(slopes):
+        for j, m in enumerate(mids):
+            coefs[i, j], sse[i, j] = profile.solve(k / std, m)
+    rows = np.arange(len(x))
+    best_slope = np.argmin(sse, axis=0)
+    sse_mid = np.take_along_axis(sse, best_slope[None], axis=0)[0]
+    # resampled rows repeat x values, keep one start per distinct midpoint
+    repeated = np.concatenate([np.zeros((1, len(x)), dtype=bool), (xs[:, 1:] == xs[:, :-1]).T])
+    sse_mid[np.concatenate([repeated, repeated[1:]])] = np.inf
+    best_mid = np.argsort(sse_mid, axis=0)[:n_starts]
+    best_slope = best_slope[best_mid, rows]
+    return np.stack([from_profile(coefs[best_slope[i], best_mid[i], rows], slopes[best_slope[i]] / std,
+                                  mids[best_mid[i], rows])
+                     for i in range(len(best_mid))])
+
+
+def _levenberg_marquardt(func, jac, x, y, t, lo, hi, mid, n_iter, tol):
+    # projected LM: the midpoint parameter is clipped to [lo, hi] after each step
+    p = t.shape[1]
+    lam = np.full(len(t), 1e-3)
+    r = y - func(t, x)
+    sse = (r ** 2).sum(axis=1)
+    eye = np.eye(p)
+    active = np.ones(len(t), dtype=bool)
+
+    for _ in range(n_iter):
+        idx = np.flatnonzero(active)
+        if len(idx) == 0:
+            break
+        J = jac(t[idx], x[idx])
+        Jt = J.transpose(0, 2, 1)
+        JtJ = Jt @ J
+        g = (Jt @ r[idx][..., None])[..., 0]
+        # Marquardt scaling, floored so that flat directions (e.g. a zero sigmoid amplitude)
+        # do not make A exactly singular
+        d = np.einsum('bii->bi', JtJ)
+        d = np.maximum(d, 1e-9 * d.max(axis=1, keepdims=True) + 1e-12)
+        A = JtJ + lam[idx, None, None] * d[:, :, None] * eye
+        try:
+            delta = np.linalg.solve(A, g[..., None])[..., 0]
+        except np.linalg.LinAlgError:
+            delta = (np.linalg.pinv(A) @ g[..., None])[..., 0]
+
+        t_new = t[idx] + delta
+        t_new[:, mid] = np.clip(t_new[:, mid], lo[idx], hi[idx])
+        with np.errstate(over='ignore', invalid='ignore'):
+            r_new = y[idx] - func(t_new, x[idx])
+            sse_new = (r_new ** 2).sum(axis=1)
+        better = np.isfinite(sse_new) & (sse_new < sse[idx])
+
+        acc = idx[better]
+        improvement = sse[acc] - sse_new[better]
+        t[acc] = t_new[better]
+        r[acc] = r_new[better]
+        sse[acc] = sse_new[better]
+        lam[acc] = np.maximum(lam[acc] / 10, 1e-9)
+        lam[idx[~better]] *= 10
+
+        converged = np.zeros(len(idx), dtype=bool)
+        converged[better] = improvement <= tol * np.maximum(sse[acc], 1)
+        converged[~better] = lam[idx[~better]] > 1e10
+        active[idx[converged]] = False
+
+    return t, sse
+
+
+def fit_batch(x, y, model='fitfun', t0=None, n_iter=200, tol=1e-10):
+    """
+    Fit the same mapping on B problems at once with Levenberg-Marquardt.
+
+    The fit surface has several local minima (a smooth sigmoid or a sharp step
+    with a strong linear term), so without t0 the starting point is the best
+    of the coeff_fit-style start and a grid over the sigmoid slope and
+    midpoint. The midpoint (t[2] of fitfun, b4 of logistic_func) is kept
+    inside the range of x, where the sigmoid is not flat on the data. Rows
+    still ending above the SSE of a straight line are fitted again from a
+    nearly linear start.
+
+    Parameters:
+    - x, y: arrays of shape (B, n)
+    - model: 'fitfun' (5 parameters) or 'logistic_func' (4 parameters)
+    - t0: starting parameters (B, p), default from the data
+    - n_iter: maximum number of iterations
+
+    Returns:
+    - params: array (B, p)
+    - fit: fitted values (B, n)
+    """
+    func, jac, init, mid, n_terms, from_profile = MODELS[model]
+    x = np.atleast_2d(np.asarray(x, dtype=np.float64))
+    y = np.atleast_2d(np.asarray(y, dtype=np.float64))
+    lo, hi = x.min(axis=1), x.max(axis=1)
+    if t0 is None:
+        grid = _grid_starts(_Profile(x, y, n_terms), from_profile)
+        starts = np.concatenate([init(x, y)[None], grid])
+    else:
+        starts = np.array(t0, dtype=np.float64)[None]
+    starts[..., mid] = np.clip(starts[..., mid], lo, hi)
+
+    # all starts of all rows go through the same batched solver, the best one is kept
+    n_starts, _, p = starts.shape
+    t, sse = _levenberg_marquardt(func, jac, np.tile(x, (n_starts, 1)), np.tile(y, (n_starts, 1)),
+                                  starts.reshape(-1, p), np.tile(lo, n_starts), np.tile(hi, n_starts),
+                                  mid, n_iter, tol)
+    sse = np.where(np.isfinite(sse), sse, np.inf).reshape(n_starts, -1)
+    best = np.argmin(sse, axis=0)
+    t = t.reshape(n_starts, -1, p)[best, np.arange(len(x))]
+    sse = sse[best, np.arange(len(x))]
+
+    # a shallow sigmoid is nearly a line: restart from there when the fit is worse than a line
+    restart = np.flatnonzero(~(sse <= linear_fit_batch(x, y) * (1 + 1e-6) + 1e-9))
+    if len(restart):
+        xr, yr = x[restart], y[restart]
+        std = xr.std(axis=1)
+        std[std == 0] = 1
+        slope, m = 0.01 / std, xr.mean(axis=1)
+        c, _ = _Profile(xr, yr, n_terms).solve(slope, m)
+        t_lin, sse_lin = _levenberg_marquardt(func, jac, xr, yr, from_profile(c, slope, m),
+                                              lo[restart], hi[restart], mid, n_iter, tol)
+        better = sse_lin < sse[restart]
+        t[restart[better]] = t_lin[better]
+
+    return t, func(t, x)
+
+
+# ===== BATCHED CORRELATIONS =====
+
+def _pearson_rows(a, b):
+    a = a - a.mean(axis=1, keepdims=True)
+    b = b - b.mean(axis=1, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (a * b).sum(axis=1) / np.sqrt((a ** 2).sum(axis=1) * (b ** 2).sum(axis=1))
+
+
+def _kendall_rows(a, b, chunk=256):
+    # tau-b, same as scipy.stats.kendalltau
+    n = a.shape[1]
+    iu, ju = np.triu_indices(n, k=1)
+    out = np.empty(len(a))
+    for start in range(0, len(a), chunk):
+        sa = np.sign(a[start:start+chunk, ju] - a[start:start+chunk, iu])
+        sb = np.sign(b[start:start+chunk, ju] - b[start:start+chunk, iu])
+        con = (sa * sb).sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out[start:start+chunk] = con / np.sqrt((sa != 0).sum(axis=1) * (sb != 0).sum(axis=1))
+    return out
+
+
+def correlations_batch(fit, y):
+    """
+    PLCC, SROCC, KROCC and RMSE of each row of fit against the same row of y.
+
+    Returns:
+    - dict of arrays of shape (B,)
+    """
+    return {
+        'plcc': _pearson_rows(fit, y),
+        'srocc': _pearson_rows(rankdata(fit, axis=1), rankdata(y, axis=1)),
+        'krocc': _kendall_rows(fit, y),
+        'rmse': np.sqrt(((np.abs(y) - np.abs(fit)) ** 2).mean(axis=1)),
+    }
+
+
+# ===== BOOTSTRAP =====
+
+STATS = ['plcc', 'srocc', 'krocc', 'rmse']
+
+
+def stimulus_bootstrap(n_stimuli, n_boot, rng):
+    """
+    Index arrays (n_boot, n_stimuli) resampling stimuli with replacement.
+    """
+    return rng.integers(0, n_stimuli, size=(n_boot, n_stimuli))
+
+
+def observer_bootstrap_mos(matrix, n_boot, rng):
+    """
+    MOS replicates obtained by resampling observers with replacement.
+
+    Parameters:
+    - matrix: participant x stimulus rating matrix (NaN for missing ratings)
+
+    Returns:
+    - array (n_boot, n_stimuli) of MOS
+    """
+    n_participants = matrix.shape[0]
+    draws = rng.integers(0, n_participants, size=(n_boot, n_participants))
+    # each replicate is a weighted mean, weights = number of times an observer was drawn
+    weights = np.zeros((n_boot, n_participants))
+    np.add.at(weights, (np.arange(n_boot)[:, None], draws), 1)
+    valid = ~np.isnan(matrix)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (weights @ np.where(valid, matrix, 0.0)) / (weights @ valid)
+
+
+def bootstrap_metrics(df, metrics, mos_col='MOS', n_boot=2000, level='stimulus',
+                      matrix=None, model='fitfun', alpha=0.05, seed=None):
+    """
+    Bootstrap confidence intervals of PLCC/SROCC/KROCC/RMSE for several metrics.
+
+    All metrics and replicates are fitted together with fit_batch, and every
+    metric sees the same resampling indices, so replicates are paired across
+    metrics (see compare_metrics).
+
+    Parameters:
+    - df: dataframe with one row per stimulus (e.g. df_metrics)
+    - metrics: list of objective metric columns
+    - mos_col: subjective score column
+    - n_boot: number of replicates
+    - level: 'stimulus' (resample rows), 'observer' (resample participants,
+      needs matrix) or 'both'
+    - matrix: participant x stimulus rating matrix aligned with df rows
+    - model: 'fitfun' or 'logistic_func'
+    - alpha: 1 - confidence level of the percentile intervals
+
+    Returns:
+    - summary: dataframe with metric, stat, estimate, ci_low, ci_high
+    - replicates: dict metric -> dict stat -> array (n_boot,)
+    """
+    rng = np.random.default_rng(seed)
+    data = df[metrics + [mos_col]].dropna()
+    x = data[metrics].to_numpy(dtype=np.float64).T
+    y = data[mos_col].to_numpy(dtype=np.float64)
+    n_metrics, n = x.shape
+
+    if level in ('observer', 'both'):
+        if matrix is None:
+            raise ValueError("observer-level bootstrap needs the rating matrix")
+        matrix = np.asarray(matrix, dtype=np.float64)[:, df.index.get_indexer(data.index)]
+        y_rep = observer_bootstrap_mos(matrix, n_boot, rng)
+    else:
+        y_rep = np.broadcast_to(y, (n_boot, n))
+
+    if level in ('stimulus', 'both'):
+        idx = stimulus_bootstrap(n, n_boot, rng)
+    else:
+        idx = np.broadcast_to(np.arange(n), (n_boot, n))
+
+    y_b = np.take_along_axis(y_rep, idx, axis=1)
+    x_b = x[:, idx]
+
+    _, fit_point = fit_batch(x, np.broadcast_to(y, (n_metrics, n)), model)
+    point = correlations_batch(fit_point, np.broadcast_to(y, (n_metrics, n)))
+
+    y_all = np.broadcast_to(y_b, (n_metrics, n_boot, n)).reshape(-1, n)
+    _, fit_all = fit_batch(x_b.reshape(-1, n), y_all, model)
+    reps = correlations_batch(fit_all, y_all)
+
+    replicates = {}
+    rows = []
+    for m, metric in enumerate(metrics):
+        replicates[metric] = {}
+        for stat in STATS:
+            values = reps[stat].reshape(n_metrics, n_boot)[m]
+            replicates[metric][stat] = values
+            low, high = np.nanpercentile(values, [100 * alpha / 2, 100 * (1 - alpha / 2)])
+            rows.append({'metric': metric, 'stat': stat, 'estimate': point[stat][m],
+                         'ci_low': low, 'ci_high': high})
+
+    return pd.DataFrame(rows), replicates
+
+
+def compare_metrics(replicates, metric_a, metric_b, stat='plcc', alpha=0.05):
+    """
+    Paired bootstrap test of stat(metric_a) - stat(metric_b).
+
+    Returns:
+    - dict with the mean difference, its percentile CI and a two-sided p-value
+    """
+    diff = replicates[metric_a][stat] - replicates[metric_b][stat]
+    diff = diff[np.isfinite(diff)]
+    low, high = np.percentile(diff, [100 * alpha / 2, 100 * (1 - alpha / 2)])
+    p_value = min(1.0, 2 * min(np.mean(diff <= 0), np.mean(diff >= 0)))
+    return {'metric_a': metric_a, 'metric_b': metric_b, 'stat': stat,
+            'diff': diff.mean(), 'ci_low': low, 'ci_high': high, 'p_value': p_value}
+
+
+def compare_all_metrics(replicates, stat='plcc', alpha=0.05):
+    """
+    compare_metrics for every pair of bootstrapped metrics.
+    """
+    names = list(replicates)
+    rows = [compare_metrics(replicates, a, b, stat, alpha)
+            for i, a in enumerate(names) for b in names[i+1:]]
+    return pd.DataFrame(rows)
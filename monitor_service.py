@@ -0,0 +1,329 @@
+"""
+Online quality monitoring of synthesized views.
+
+A DIBR renderer (or the synthetic producer below) sends paired reference /
+distorted luma frames over a local TCP socket. Each message is a header
+(magic, frame id, width, height, sender timestamp) followed by the two
+width*height uint8 luma planes.
+
+Frames are scored with the metrics of the current level. When the latency
+(receipt to end of scoring) goes over the per-frame budget or frames pile up,
+the monitor moves to a cheaper level; it moves back after a calm period.
+Rolling pooled scores and latency percentiles are available with stats() and
+can be published to a JSON file.
+"""
+import argparse
+import json
+import os
+import queue
+import socket
+import struct
+import threading
+import time
+from collections import deque
+
+import numpy as np
+from skimage.metrics import peak_signal_noise_ratio as psnr
+from skimage.metrics import structural_similarity as ssim
+
+from video_metrics import calculate_SI, frame_diff
+from vif_utilis import vif_spatial
+
+
+HEADER = struct.Struct('<4sIIId')
+MAGIC = b'QOEF'
+MAX_SIDE = 8192  # larger frame sizes in a header are treated as a corrupt stream
+
+# luma metrics, by cost
+MONITOR_METRICS = {
+    'PSNR': lambda ref, dis: psnr(ref, dis, data_range=255),
+    'SSIM': lambda ref, dis: ssim(ref, dis, data_range=255),
+    'VIF_spatial': lambda ref, dis: vif_spatial(ref, dis),
+}
+
+# from the most complete to the cheapest metric subset
+LEVELS = [
+    ('PSNR', 'SSIM', 'VIF_spatial', 'SI', 'TI'),
+    ('PSNR', 'SSIM', 'SI', 'TI'),
+    ('PSNR', 'TI'),
+    ('PSNR',),
+]
+
+
+def _recv_exact(conn, n, stop=None):
+    # retries on timeouts so a slow producer never desynchronizes the stream
+    buffer = bytearray(n)
+    view = memoryview(buffer)
+    filled = 0
+    while filled < n:
+        try:
+            got = conn.recv_into(view[filled:])
+        except socket.timeout:
+            if stop is not None and stop.is_set():
+                return None
+            continue
+        if not got:
+            return None
+        filled += got
+    return buffer
+
+
+def send_frame_pair(conn, frame_id, ref_y, dis_y):
+    """
+    Send one reference / distorted luma pair to the monitor.
+    """
+    height, width = ref_y.shape
+    conn.sendall(HEADER.pack(MAGIC, frame_id, width, height, time.time()))
+    conn.sendall(np.ascontiguousarray(ref_y, dtype=np.uint8).data)
+    conn.sendall(np.ascontiguousarray(dis_y, dtype=np.uint8).data)
+
+
+class QualityMonitor:
+    """
+    Long-running frame-pair scorer with a per-frame latency budget.
+
+    Parameters:
+    - levels: metric subsets from the most complete to the cheapest
+    - budget_ms: per-frame latency budget
+    - window: number of frames in the rolling statistics
+    - queue_size: frames waiting to be scored; the oldest is dropped when full
+    - recover_frames: frames under half the budget before going back up one level
+    - publish_path: JSON file updated with stats() every publish_every seconds
+    """
+
+    def __init__(self, levels=LEVELS, budget_ms=40.0, window=250, queue_size=8,
+                 recover_frames=50, publish_path=None, publish_every=1.0):
+        self.levels = [tuple(level) for level in levels]
+        self.budget = budget_ms / 1000
+        self.recover_frames = recover_frames
+        self.publish_path = publish_path
+        self.publish_every = publish_every
+
+        self.level = 0
+        self.frames = 0
+        self.dropped = 0
+        self.level_changes = 0
+        self._calm = 0
+        self._prev_dis = None
+        self._prev_id = None
+        self._last_publish = 0.0
+        self._scores = {m: deque(maxlen=window) for level in self.levels for m in level}
+        self._latency = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._threads = []
+        self._server = None
+        self.address = None
+
+    @property
+    def metrics(self):
+        return self.levels[self.level]
+
+    def score_pair(self, ref_y, dis_y, received=None, frame_id=None):
+        """
+        Score one luma pair with the current level and adapt the level.
+        TI is only computed between consecutive frame ids (not across dropped frames).
+
+        Returns:
+        - dict metric -> value for this frame
+        """
+        received = time.perf_counter() if received is None else received
+        scores = {}
+        for m in self.metrics:
+            if m in MONITOR_METRICS:
+                scores[m] = MONITOR_METRICS[m](ref_y, dis_y)
+        if 'SI' in self.metrics:
+            scores['SI'] = calculate_SI(dis_y)
+        consecutive = frame_id is None or self._prev_id is None or frame_id == self._prev_id + 1
+        if 'TI' in self.metrics and consecutive and self._prev_dis is not None \
+                and self._prev_dis.shape == dis_y.shape:
+            scores['TI'] = np.std(frame_diff(self._prev_dis, dis_y))
+        self._prev_dis = dis_y
+        self._prev_id = frame_id
+
+        latency = time.perf_counter() - received
+        with self._lock:
+            self.frames += 1
+            self._latency.append(latency)
+            for m, v in scores.items():
+                if np.isfinite(v):
+                    self._scores[m].append(v)
+            self._adapt(latency)
+        self._maybe_publish()
+        return scores
+
+    def _adapt(self, latency):
+        behind = latency > self.budget or self._queue.qsize() >= max(1, self._queue.maxsize // 2)
+        if behind:
+            self._calm = 0
+            if self.level < len(self.levels) - 1:
+                self._set_level(self.level + 1)
+        elif latency < self.budget / 2 and self._queue.empty():
+            self._calm += 1
+            if self._calm >= self.recover_frames and self.level > 0:
+                self._set_level(self.level - 1)
+                self._calm = 0
+
+    def _set_level(self, level):
+        # the rolling scores of metrics that leave the level would be stale when they come back
+        for m in set(self.metrics) - set(self.levels[level]):
+            self._scores[m].clear()
+        self.level = level
+        self.level_changes += 1
+
+    def stats(self):
+        """
+        Rolling pooled scores of the current level's metrics and latency percentiles (in ms).
+        """
+        with self._lock:
+            latency = np.array(self._latency) * 1000
+            pooled = {m: float(np.mean(self._scores[m])) for m in self.metrics if self._scores[m]}
+            p50, p95, p99 = np.percentile(latency, [50, 95, 99]) if len(latency) else (None,) * 3
+            return {
+                'frames': self.frames,
+                'dropped': self.dropped,
+                'level': self.level,
+                'metrics': list(self.metrics),
+                'level_changes': self.level_changes,
+                'budget_ms': self.budget * 1000,
+                'latency_p50_ms': p50,
+                'latency_p95_ms': p95,
+                'latency_p99_ms': p99,
+                'pooled': pooled,
+            }
+
+    def _maybe_publish(self):
+        if self.publish_path is None:
+            return
+        now = time.monotonic()
+        if now - self._last_publish < self.publish_every:
+            return
+        self._last_publish = now
+        tmp = self.publish_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.stats(), f, default=float)
+        os.replace(tmp, self.publish_path)
+
+    # ===== SERVICE =====
+
+    def start(self, host='127.0.0.1', port=0):
+        """
+        Listen on host:port (port 0 = any free port) and score frames in background threads.
+
+        Returns:
+        - (host, port) actually bound
+        """
+        self._server = socket.create_server((host, port))
+        self._server.settimeout(0.2)
+        self.address = self._server.getsockname()[:2]
+        self._threads = [threading.Thread(target=self._accept_loop, daemon=True),
+                         threading.Thread(target=self._score_loop, daemon=True)]
+        for t in self._threads:
+            t.start()
+        return self.address
+
+    def stop(self):
+        self._stop.set()
+        for t in self._threads:
+            t.join()
+        if self._server is not None:
+            self._server.close()
+        self._last_publish = 0.0
+        self._maybe_publish()
+
+    def _accept_loop(self):
+        while not self._stop.is_set():
+            try:
+                conn, _ = self._server.accept()
+            except socket.timeout:
+                continue
+            with conn:
+                conn.settimeout(0.5)
+                self._receive(conn)
+
+    def _receive(self, conn):
+        while not self._stop.is_set():
+            header = _recv_exact(conn, HEADER.size, self._stop)
+            if header is None:
+                return
+            magic, frame_id, width, height, sent = HEADER.unpack(header)
+            if magic != MAGIC or not (0 < width <= MAX_SIDE and 0 < height <= MAX_SIDE):
+                print("Bad frame header from producer, closing connection")
+                return
+            planes = _recv_exact(conn, 2 * width * height, self._stop)
+            if planes is None:
+                return
+            received = time.perf_counter()
+            data = np.frombuffer(planes, dtype=np.uint8)
+            ref_y = data[:width * height].reshape(height, width)
+            dis_y = data[width * height:].reshape(height, width)
+            item = (ref_y, dis_y, received, frame_id)
+            while True:
+                try:
+                    self._queue.put_nowait(item)
+                    break
+                except queue.Full:
+                    try:
+                        self._queue.get_nowait()  # drop the oldest frame
+                        with self._lock:
+                            self.dropped += 1
+                    except queue.Empty:
+                        pass
+
+    def _score_loop(self):
+        while not self._stop.is_set() or not self._queue.empty():
+            try:
+                ref_y, dis_y, received, frame_id = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            self.score_pair(ref_y, dis_y, received, frame_id)
+
+
+def synthetic_producer(address, n_frames=100, width=320, height=240, fps=25.0, noise=5.0, seed=0):
+    """
+    Send moving synthetic frames with a noisy, flickering distorted copy (for tests and demos).
+    """
+    rng = np.random.default_rng(seed)
+    x = np.arange(width)[None, :]
+    y = np.arange(height)[:, None]
+    with socket.create_connection(address) as conn:
+        for i in range(n_frames):
+            ref = (127 + 60 * np.sin((x + 3 * i) / 9.0) * np.cos((y - i) / 13.0)).astype(np.uint8)
+            dis = ref.astype(np.float64) + rng.normal(0, noise, ref.shape)
+            dis[height // 4:height // 2, width // 4:width // 2] += 20 if i % 2 else -20
+            send_frame_pair(conn, i, ref, np.clip(dis, 0, 255).astype(np.uint8))
+            if fps:
+                time.sleep(1 / fps)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Online synthesized-view quality monitor")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5600)
+    parser.add_argument('--budget-ms', type=float, default=40.0)
+    parser.add_argument('--publish', default='monitor_stats.json')
+    parser.add_argument('--demo', type=int, default=0, help="run the synthetic producer for N frames")
+    args = parser.parse_args()
+
+    monitor = QualityMonitor(budget_ms=args.budget_ms, publish_path=args.publish)
+    address = monitor.start(args.host, args.port)
+    print(f"Listening on {address[0]}:{address[1]}")
+    try:
+        if args.demo:
+            synthetic_producer(address, n_frames=args.demo)
+            time.sleep(0.5)
+        else:
+            while True:
+                time.sleep(5)
+                s = monitor.stats()
+                print(f"frames={s['frames']} level={s['metrics']} p95={s['latency_p95_ms']} pooled={s['pooled']}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        monitor.stop()
+        print(json.dumps(monitor.stats(), indent=2, default=float))
+
+
+if __name__ == '__main__':
+    main()
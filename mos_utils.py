@@ -0,0 +1,261 @@
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+
+KEYS = ['reference', 'condition']
+SEEN_KEYS = ['participant'] + KEYS
+STAT_COLS = ['n', 'sum', 'sumsq']
+DMOS_OFFSET = 20
+MIN_CORR = 0.5
+
+
+class MOSAggregator:
+    """
+    Incremental MOS / DMOS / CI_95 aggregation over SAMVIQ rating files.
+
+    Only sufficient statistics (count, sum, sum of squares) are kept per
+    (reference, condition), so new participant files can be folded in
+    without reloading the previous ones or building a wide pivot table.
+    The (participant, reference, condition) keys already folded in are
+    remembered, so a participant's later sessions only add new stimuli.
+    """
+
+    def __init__(self, dmos_offset=DMOS_OFFSET):
+        self.dmos_offset = dmos_offset
+        self.stats = pd.DataFrame(
+            columns=STAT_COLS,
+            index=pd.MultiIndex.from_arrays([[], []], names=KEYS),
+            dtype=np.float64,
+        )
+        self.files = set()
+        self.seen = set()
+
+    def add_ratings(self, ratings):
+        """
+        Fold a long-format ratings dataframe into the statistics.
+
+        Parameters:
+        - ratings: dataframe with 'participant', 'reference', 'condition', 'rating'
+
+        Returns:
+        - number of ratings added
+        """
+        # keys are compared as strings, read_csv may parse participant IDs as numbers
+        ratings = ratings.dropna(subset=['rating']).astype({'participant': str})
+        # same rule as pivot_table(aggfunc='first'): one rating per participant and stimulus
+        new = ratings.drop_duplicates(subset=SEEN_KEYS, keep='first')
+        keys = new[SEEN_KEYS].astype(str)
+        fresh = ~pd.MultiIndex.from_frame(keys).isin(self.seen)
+        new, keys = new[fresh], keys[fresh]
+        if new.empty:
+            return 0
+
+        values = new['rating'].astype(np.float64)
+        grouped = new.assign(n=1.0, sum=values, sumsq=values ** 2).groupby(KEYS)[STAT_COLS].sum()
+        self.stats = self.stats.add(grouped, fill_value=0)
+        self.seen.update(keys.itertuples(index=False, name=None))
+        return len(new)
+
+    def add_file(self, path):
+        """
+        Fold one participant CSV file into the statistics (skipped if already added).
+        """
+        path = os.path.abspath(path)
+        if path in self.files:
+            return 0
+        added = self.add_ratings(pd.read_csv(path))
+        self.files.add(path)
+        return added
+
+    def add_directory(self, data_path, pattern="*_samviq.csv"):
+        """
+        Fold every not-yet-seen rating file of a directory.
+
+        Returns:
+        - number of ratings added
+        """
+        added = 0
+        for file in sorted(glob.glob(os.path.join(data_path, pattern))):
+            added += self.add_file(file)
+        return added
+
+    @property
+    def participants(self):
+        return {participant for participant, _, _ in self.seen}
+
+    @property
+    def n_participants(self):
+        return len(self.participants)
+
+    def results(self):
+        """
+        Compute MOS, DMOS and CI_95 from the current statistics.
+
+        Returns:
+        - long-format dataframe with columns video, condition, n, MOS, DMOS, CI_95
+        """
+        return stats_to_mos(self.stats, self.dmos_offset)
+
+    def save(self, path):
+        """
+        Save the sufficient statistics, the folded (participant, reference,
+        condition) keys (path + '.seen') and the folded files (path + '.files').
+        """
+        out = self.stats.reset_index()
+        out.to_csv(path, index=False)
+        pd.DataFrame(sorted(self.seen), columns=SEEN_KEYS).to_csv(path + '.seen', index=False)
+        pd.Series(sorted(self.files), name='file').to_csv(path + '.files', index=False)
+
+    @classmethod
+    def load(cls, path, dmos_offset=DMOS_OFFSET):
+        agg = cls(dmos_offset)
+        agg.stats = pd.read_csv(path).set_index(KEYS)[STAT_COLS].astype(np.float64)
+        if os.path.exists(path + '.seen'):
+            seen = pd.read_csv(path + '.seen', dtype=str)
+            agg.seen = set(seen[SEEN_KEYS].itertuples(index=False, name=None))
+        if os.path.exists(path + '.files'):
+            agg.files = set(pd.read_csv(path + '.files', dtype=str)['file'])
+        return agg
+
+
+def stats_to_mos(stats, dmos_offset=DMOS_OFFSET):
+    """
+    Turn (n, sum, sumsq) statistics indexed by (reference, condition) into MOS/DMOS/CI_95.
+
+    Same definitions as the notebook: CI_95 = 1.96 * std / sqrt(n) with the
+    sample (ddof=1) std, DMOS = MOS(Original) - MOS + dmos_offset.
+    """
+    n = stats['n'].to_numpy()
+    s = stats['sum'].to_numpy()
+    ss = stats['sumsq'].to_numpy()
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mos = s / n
+        var = np.maximum(ss - s * mos, 0) / (n - 1)
+        ci = 1.96 * np.sqrt(var) / np.sqrt(n)
+
+    df = pd.DataFrame({'n': n, 'MOS': mos, 'CI_95': ci}, index=stats.index).reset_index()
+    df = df.rename(columns={'reference': 'video'})
+
+    reference_mos = df[df['condition'] == 'Original'].groupby('video')['MOS'].mean()
+    df['DMOS'] = df['video'].map(reference_mos) - df['MOS'] + dmos_offset
+    df['n'] = df['n'].astype(int)
+    return df[['video', 'condition', 'n', 'MOS', 'DMOS', 'CI_95']]
+
+
+def rating_matrix(ratings):
+    """
+    Build the participant x stimulus rating matrix from long-format ratings.
+
+    Parameters:
+    - ratings: dataframe with 'participant', 'reference', 'condition', 'rating'
+
+    Returns:
+    - matrix: float array (n_participants, n_stimuli), NaN where no rating
+    - participants: array of participant names (rows)
+    - stimuli: MultiIndex (reference, condition) of the columns
+    """
+    ratings = ratings.dropna(subset=['rating'])
+    ratings = ratings.drop_duplicates(subset=['participant'] + KEYS, keep='first')
+    rows, participants = pd.factorize(ratings['participant'], sort=True)
+    cols, stimuli = pd.MultiIndex.from_frame(ratings[KEYS]).factorize(sort=True)
+
+    matrix = np.full((len(participants), len(stimuli)), np.nan)
+    matrix[rows, cols] = ratings['rating'].to_numpy(dtype=np.float64)
+    return matrix, np.asarray(participants), pd.MultiIndex.from_tuples(stimuli, names=KEYS)
+
+
+def bt500_screening(matrix, max_ratio=0.05, max_asymmetry=0.3, min_corr=None):
+    """
+    ITU-R BT.500 observer screening on a participant x stimulus matrix.
+
+    For each stimulus the kurtosis (beta2) decides whether the distribution
+    is considered normal (2 <= beta2 <= 4, threshold 2*std) or not
+    (threshold sqrt(20)*std). P and Q count, for each observer, the ratings
+    above mean + threshold and below mean - threshold; the observer is
+    rejected if (P+Q)/N > max_ratio and |P-Q|/(P+Q) < max_asymmetry.
+
+    The Pearson correlation of each observer with the mean of the other
+    observers is also computed, but it only rejects observers when min_corr
+    is given (observers below it are then rejected as well). The default
+    is the plain BT.500 test, which keeps an observer who is consistently
+    inverted but rarely outside the thresholds; screened_mos sets min_corr.
+
+    Returns:
+    - dict of per-observer arrays: P, Q, N, corr, rejected
+    """
+    valid = ~np.isnan(matrix)
+    n_obs = valid.sum(axis=0)
+    x = np.where(valid, matrix, 0.0)
+
+    sums = x.sum(axis=0)
+    mean = sums / np.maximum(n_obs, 1)
+    dev = np.where(valid, matrix - mean, 0.0)
+    m2 = (dev ** 2).sum(axis=0) / np.maximum(n_obs, 1)
+    m4 = (dev ** 4).sum(axis=0) / np.maximum(n_obs, 1)
+    std = np.sqrt((dev ** 2).sum(axis=0) / np.maximum(n_obs - 1, 1))
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        beta2 = m4 / m2 ** 2
+    normal = np.isnan(beta2) | ((beta2 >= 2) & (beta2 <= 4))
+    threshold = np.where(normal, 2.0, np.sqrt(20.0)) * std
+
+    P = (valid & (matrix >= mean + threshold) & (threshold > 0)).sum(axis=1)
+    Q = (valid & (matrix <= mean - threshold) & (threshold > 0)).sum(axis=1)
+    N = valid.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rejected = ((P + Q) / np.maximum(N, 1) > max_ratio) & (np.abs(P - Q) / (P + Q) < max_asymmetry)
+
+    # leave-one-out panel mean, so an observer is not correlated with itself
+    with np.errstate(invalid='ignore', divide='ignore'):
+        others = (sums - x) / (n_obs - valid)
+    pair = valid & ~np.isnan(others) & np.isfinite(others)
+    k = pair.sum(axis=1)
+    a = np.where(pair, matrix, 0.0)
+    b = np.where(pair, others, 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        a_c = np.where(pair, a - a.sum(axis=1, keepdims=True) / k[:, None], 0.0)
+        b_c = np.where(pair, b - b.sum(axis=1, keepdims=True) / k[:, None], 0.0)
+        corr = (a_c * b_c).sum(axis=1) / np.sqrt((a_c ** 2).sum(axis=1) * (b_c ** 2).sum(axis=1))
+
+    if min_corr is not None:
+        rejected |= ~(corr >= min_corr)
+
+    return {'P': P, 'Q': Q, 'N': N, 'corr': corr, 'rejected': rejected}
+
+
+def screened_mos(ratings, dmos_offset=DMOS_OFFSET, min_corr=MIN_CORR, **kwargs):
+    """
+    MOS / DMOS / CI_95 recomputed after BT.500 observer screening.
+
+    Besides the BT.500 P/Q test, observers whose correlation with the rest
+    of the panel is below min_corr are rejected (pass min_corr=None for
+    the BT.500 test alone).
+
+    Parameters:
+    - ratings: long-format ratings (as in the data/*_samviq.csv files)
+    - dmos_offset: offset added to DMOS (same as the notebook)
+    - min_corr: minimum correlation with the leave-one-out panel mean
+    - kwargs: passed to bt500_screening (max_ratio, max_asymmetry)
+
+    Returns:
+    - results: long-format dataframe as MOSAggregator.results()
+    - screening: per-participant dataframe (P, Q, N, corr, rejected)
+    """
+    matrix, participants, stimuli = rating_matrix(ratings)
+    screen = bt500_screening(matrix, min_corr=min_corr, **kwargs)
+
+    kept = matrix[~screen['rejected']]
+    valid = ~np.isnan(kept)
+    x = np.where(valid, kept, 0.0)
+    stats = pd.DataFrame({
+        'n': valid.sum(axis=0).astype(np.float64),
+        'sum': x.sum(axis=0),
+        'sumsq': (x ** 2).sum(axis=0),
+    }, index=stimuli)
+
+    screening = pd.DataFrame(screen, index=pd.Index(participants, name='participant'))
+    return stats_to_mos(stats, dmos_offset), screening
@@ -0,0 +1,175 @@
+import json
+import os
+
+import numpy as np
+
+from video_metrics import as_reader, calculate_SI, frame_diff, summarize_SI_TI
+from vif_utilis import vif_rr, vif_rr_features, vif_spatial_rr, vif_spatial_rr_features
+
+
+FEATURE_VERSION = 1
+DEFAULT_PARAMS = {'wavelet': 'steerable', 'M': 3, 's_block': 8, 'k': 11, 'var_block': 16}
+
+
+def frame_rr_features(y, params):
+    """
+    Reduced-reference features of one luma frame.
+
+    Returns:
+    - s: list of block-pooled GSM multiplier maps (one per subband)
+    - lamda: array (n_subbands, M*M) of GSM eigenvalues
+    - var: block-pooled local variance map (moments)
+    """
+    y = y.astype(np.float32)
+    s, lamda = vif_rr_features(y, params['wavelet'], params['M'], params['s_block'])
+    var = vif_spatial_rr_features(y, params['k'], 1, params['var_block'])
+    return s, np.array(lamda), var
+
+
+def extract_rr_features(video_source, out_dir, width=None, height=None, max_frames=None, **params):
+    """
+    Extract the reduced-reference features of a reference video, once.
+
+    The features are written to out_dir as .npy files (float16 maps), plus a
+    meta.json with the extraction parameters and map shapes:
+    - s.npy: (n_frames, total s blocks) GSM multipliers of every subband, concatenated
+    - lamda.npy: (n_frames, n_subbands, M*M) GSM eigenvalues
+    - var.npy: (n_frames, var blocks) local variances
+    - si_ti.npy: (n_frames, 2) SI and TI (TI is NaN for the first frame)
+
+    Parameters:
+    - video_source: AVI, Y4M or raw YUV path, '-' for stdin, or a reader
+    - out_dir: output directory
+    - params: override DEFAULT_PARAMS (wavelet, M, s_block, k, var_block)
+
+    Returns:
+    - size of the feature files in bytes
+    """
+    params = {**DEFAULT_PARAMS, **params}
+    reader = as_reader(video_source, width, height, max_frames)
+
+    s_rows, lamda_rows, var_rows, si_ti = [], [], [], []
+    s_shapes = var_shape = None
+    prev_y = None
+    for frame in reader:
+        s, lamda, var = frame_rr_features(frame.y, params)
+        if s_shapes is None:
+            s_shapes = [list(x.shape) for x in s]
+            var_shape = list(var.shape)
+            width, height = frame.width, frame.height
+        s_rows.append(np.concatenate([x.ravel() for x in s]).astype(np.float16))
+        lamda_rows.append(lamda.astype(np.float32))
+        var_rows.append(var.ravel().astype(np.float16))
+        ti = np.std(frame_diff(prev_y, frame.y)) if prev_y is not None else np.nan
+        si_ti.append((calculate_SI(frame.y), ti))
+        prev_y = frame.y
+    reader.close()
+
+    if not s_rows:
+        raise ValueError(f"No frame read from {video_source}")
+
+    os.makedirs(out_dir, exist_ok=True)
+    np.save(os.path.join(out_dir, 's.npy'), np.stack(s_rows))
+    np.save(os.path.join(out_dir, 'lamda.npy'), np.stack(lamda_rows))
+    np.save(os.path.join(out_dir, 'var.npy'), np.stack(var_rows))
+    np.save(os.path.join(out_dir, 'si_ti.npy'), np.array(si_ti, dtype=np.float32))
+    meta = {'version': FEATURE_VERSION, 'params': params, 'n_frames': len(s_rows),
+            'width': width, 'height': height, 's_shapes': s_shapes, 'var_shape': var_shape}
+    with open(os.path.join(out_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+    return features_size(out_dir)
+
+
+def features_size(path):
+    return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+
+
+def load_rr_features(path):
+    """
+    Open a feature directory written by extract_rr_features; arrays are memory-mapped.
+    """
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+    if meta.get('version') != FEATURE_VERSION:
+        raise ValueError(f"Unsupported feature version {meta.get('version')} in {path}")
+    features = {name: np.load(os.path.join(path, name + '.npy'), mmap_mode='r')
+                for name in ['s', 'lamda', 'var', 'si_ti']}
+    features['meta'] = meta
+    return features
+
+
+def _unpack_s(row, shapes):
+    out = []
+    offset = 0
+    for shape in shapes:
+        size = shape[0] * shape[1]
+        out.append(np.asarray(row[offset:offset + size], dtype=np.float64).reshape(shape))
+        offset += size
+    return out
+
+
+RR_METRICS = ['VIF_rr', 'VIF_spatial_rr', 'SI', 'TI']
+
+
+def score_rr(features, dis_source, metrics=('VIF_rr', 'VIF_spatial_rr'), frame_sample_rate=1,
+             width=None, height=None):
+    """
+    Score a distorted video against reduced-reference features, without the reference video.
+
+    The distorted frames go through the same feature extraction as the
+    reference, and vif_rr / vif_spatial_rr compare the two feature sets.
+
+    Parameters:
+    - features: directory from extract_rr_features, or the dict from load_rr_features
+    - dis_source: AVI, Y4M or raw YUV path, '-' for stdin, or a reader
+    - metrics: names from RR_METRICS ('SI'/'TI' also give the mean absolute
+      difference with the reference SI/TI)
+    - frame_sample_rate: compute VIF_rr / VIF_spatial_rr every Nth frame
+
+    Returns:
+    - dict metric -> mean over frames
+    """
+    if not isinstance(features, dict):
+        features = load_rr_features(features)
+    unknown = set(metrics) - set(RR_METRICS)
+    if unknown:
+        raise ValueError(f"Unknown metrics: {sorted(unknown)}")
+    meta = features['meta']
+    params = meta['params']
+    content = 'SI' in metrics or 'TI' in metrics
+
+    reader = as_reader(dis_source, width, height, meta['n_frames'])
+    scores = {m: [] for m in metrics if m in ('VIF_rr', 'VIF_spatial_rr')}
+    si_values, ti_values, si_diff, ti_diff = [], [], [], []
+    prev_y = None
+
+    for frame_idx, frame in enumerate(reader):
+        if frame.width != meta['width'] or frame.height != meta['height']:
+            raise ValueError(f"Frame size {frame.width}x{frame.height} does not match "
+                             f"the reference features {meta['width']}x{meta['height']}")
+        if frame_idx % frame_sample_rate == 0 and scores:
+            s, lamda, var = frame_rr_features(frame.y, params)
+            if 'VIF_rr' in scores:
+                s_ref = _unpack_s(features['s'][frame_idx], meta['s_shapes'])
+                scores['VIF_rr'].append(vif_rr(s_ref, features['lamda'][frame_idx], s, lamda))
+            if 'VIF_spatial_rr' in scores:
+                var_ref = np.asarray(features['var'][frame_idx], dtype=np.float64).reshape(meta['var_shape'])
+                scores['VIF_spatial_rr'].append(vif_spatial_rr(var_ref, var))
+        if content:
+            si_ref, ti_ref = features['si_ti'][frame_idx]
+            si_values.append(calculate_SI(frame.y))
+            si_diff.append(abs(si_values[-1] - si_ref))
+            if prev_y is not None:
+                ti_values.append(np.std(frame_diff(prev_y, frame.y)))
+                ti_diff.append(abs(ti_values[-1] - ti_ref))
+            prev_y = frame.y
+    reader.close()
+
+    results = {m: float(np.mean(v)) if v else None for m, v in scores.items()}
+    if content:
+        keys = ['SI_mean', 'SI_max', 'SI_p95', 'TI_mean', 'TI_max', 'TI_p95']
+        results.update(zip(keys, summarize_SI_TI(si_values, ti_values)))
+        results['SI_diff'] = float(np.mean(si_diff)) if si_diff else None
+        results['TI_diff'] = float(np.mean(ti_diff)) if ti_diff else None
+    return results
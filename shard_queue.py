@@ -0,0 +1,313 @@
+"""
+Sharded scoring with a file-based work queue.
+
+The queue is a directory (local, or shared between hosts over a network
+filesystem):
+
+    queue_dir/
+        manifest.csv        video pairs to score, one row per pair
+        pending/unit_*.json work units waiting for a worker
+        leased/unit_*.json  units being scored; the file mtime is the lease heartbeat,
+                            renewed by a worker thread while the unit is scored
+        done/unit_*.csv     scored rows of each finished unit
+        done/unit_*.json    per-unit stats (worker, rows, seconds)
+        failed/unit_*.json  units that ran out of retries
+
+Claims are atomic renames from pending/ to leased/. A lease that is not
+renewed for lease_seconds is put back in pending/ by any worker, so killed
+workers do not lose rows, and a unit whose scoring raises is put back at
+once by its worker (both count an attempt); results are written once per unit name, so a unit
+scored twice cannot produce duplicate rows.
+"""
+import argparse
+import glob
+import json
+import os
+import socket
+import threading
+import time
+
+import pandas as pd
+
+from config import SAVE_PATH, VIDEOS_PATH
+
+
+SUBDIRS = ['pending', 'leased', 'done', 'failed']
+
+
+def _unit_path(queue_dir, state, unit, ext='.json'):
+    return os.path.join(queue_dir, state, unit + ext)
+
+
+def _write_atomic(path, write):
+    tmp = f"{path}.{socket.gethostname()}-{os.getpid()}.tmp"
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def _write_json(path, data):
+    def write(tmp):
+        with open(tmp, 'w') as f:
+            json.dump(data, f)
+    _write_atomic(path, write)
+
+
+def init_queue(manifest, queue_dir, unit_size=4):
+    """
+    Split a manifest of video pairs into work units.
+
+    Parameters:
+    - manifest: dataframe (or CSV path) with one row per video pair
+    - queue_dir: queue directory (created)
+    - unit_size: number of rows per work unit
+
+    Returns:
+    - number of work units
+    """
+    if not isinstance(manifest, pd.DataFrame):
+        manifest = pd.read_csv(manifest)
+    for sub in SUBDIRS:
+        os.makedirs(os.path.join(queue_dir, sub), exist_ok=True)
+    manifest = manifest.reset_index(drop=True)
+    manifest.to_csv(os.path.join(queue_dir, 'manifest.csv'), index_label='row_id')
+
+    n_units = 0
+    for start in range(0, len(manifest), unit_size):
+        unit = f"unit_{n_units:06d}"
+        rows = list(range(start, min(start + unit_size, len(manifest))))
+        _write_json(_unit_path(queue_dir, 'pending', unit), {'unit': unit, 'rows': rows, 'attempts': 0})
+        n_units += 1
+    return n_units
+
+
+def _release(queue_dir, path, data, max_attempts):
+    # count one more attempt and move a leased unit to pending/ (or failed/ once
+    # attempts run out); the rename to a private name decides which worker does it
+    unit = data['unit']
+    data = {**data, 'attempts': data['attempts'] + 1}
+    state = 'pending' if data['attempts'] < max_attempts else 'failed'
+    tmp = f"{_unit_path(queue_dir, state, unit)}.{socket.gethostname()}-{os.getpid()}.tmp"
+    try:
+        os.rename(path, tmp)
+    except FileNotFoundError:
+        return None
+    with open(tmp, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp, _unit_path(queue_dir, state, unit))
+    return state
+
+
+def requeue_expired(queue_dir, lease_seconds=600, max_attempts=3):
+    """
+    Put back in pending/ the leased units whose heartbeat is older than lease_seconds.
+
+    Returns:
+    - list of requeued units
+    """
+    requeued = []
+    now = time.time()
+    for path in glob.glob(os.path.join(queue_dir, 'leased', 'unit_*.json')):
+        try:
+            if now - os.path.getmtime(path) < lease_seconds:
+                continue
+            with open(path) as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            continue  # finished or requeued by someone else meanwhile
+        if _release(queue_dir, path, data, max_attempts) == 'pending':
+            requeued.append(data['unit'])
+    return requeued
+
+
+def claim_unit(queue_dir):
+    """
+    Atomically move one pending unit to leased/.
+
+    Returns:
+    - the unit dict, or None if nothing is pending
+    """
+    for path in sorted(glob.glob(os.path.join(queue_dir, 'pending', 'unit_*.json'))):
+        unit = os.path.basename(path)[:-len('.json')]
+        leased = _unit_path(queue_dir, 'leased', unit)
+        try:
+            os.rename(path, leased)
+        except FileNotFoundError:
+            continue  # claimed by another worker
+        os.utime(leased)
+        with open(leased) as f:
+            return json.load(f)
+    return None
+
+
+def _heartbeat(path, interval, stop):
+    # renew the lease while the unit is scored, however long a single row takes
+    while not stop.wait(interval):
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return  # lease lost (requeued by another worker)
+
+
+def default_score_fn(row, metrics=('PSNR', 'SSIM', 'VIF_spatial', 'SI', 'TI'), frame_sample_rate=15):
+    from video_metrics import score_video
+    return score_video(os.path.join(VIDEOS_PATH, row['ref_video_path']),
+                       os.path.join(VIDEOS_PATH, row['Video_path']),
+                       metrics=metrics, frame_sample_rate=frame_sample_rate)
+
+
+def run_worker(queue_dir, score_fn=default_score_fn, lease_seconds=600, max_attempts=3,
+               max_units=None, worker_id=None):
+    """
+    Claim and score work units until the queue is empty.
+
+    Parameters:
+    - queue_dir: queue directory from init_queue
+    - score_fn: function(manifest row) -> dict of metric values
+    - lease_seconds: a lease not renewed for this long is considered dead; a background
+      thread renews it every lease_seconds / 4 while the unit is scored
+    - max_attempts: attempts before a unit goes to failed/; a unit whose score_fn
+      raises goes straight back to pending/ with one more attempt counted
+    - max_units: stop after this many units (None = until the queue is empty)
+
+    Returns:
+    - number of units scored by this worker
+    """
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    manifest = pd.read_csv(os.path.join(queue_dir, 'manifest.csv'), index_col='row_id')
+    scored = 0
+
+    while max_units is None or scored < max_units:
+        requeue_expired(queue_dir, lease_seconds, max_attempts)
+        data = claim_unit(queue_dir)
+        if data is None:
+            if not glob.glob(os.path.join(queue_dir, 'leased', 'unit_*.json')):
+                break
+            time.sleep(min(lease_seconds / 4, 5))  # wait for leases that may expire
+            continue
+
+        unit = data['unit']
+        leased = _unit_path(queue_dir, 'leased', unit)
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=_heartbeat, args=(leased, lease_seconds / 4, stop), daemon=True)
+        heartbeat.start()
+        start = time.time()
+        rows = []
+        try:
+            for row_id in data['rows']:
+                row = manifest.loc[row_id]
+                rows.append({'row_id': row_id, **row.to_dict(), **score_fn(row)})
+        except Exception as e:
+            # retry right away instead of waiting for the lease to expire
+            state = _release(queue_dir, leased, data, max_attempts) or 'another worker'
+            print(f"{worker_id}: unit {unit} failed ({e}), moved to {state}")
+            continue
+        finally:
+            stop.set()
+            heartbeat.join()
+
+        elapsed = time.time() - start
+        _write_atomic(_unit_path(queue_dir, 'done', unit, '.csv'),
+                      lambda tmp: pd.DataFrame(rows).to_csv(tmp, index=False))
+        _write_json(_unit_path(queue_dir, 'done', unit), {
+            'unit': unit, 'worker': worker_id, 'rows': len(rows), 'attempts': data['attempts'] + 1,
+            'seconds': elapsed, 'rows_per_second': len(rows) / elapsed if elapsed > 0 else None,
+        })
+        # the unit is done: drop its lease, and any copy requeued after a lost lease
+        for state in ['leased', 'pending', 'failed']:
+            try:
+                os.remove(_unit_path(queue_dir, state, unit))
+            except FileNotFoundError:
+                pass
+        scored += 1
+    return scored
+
+
+def queue_status(queue_dir):
+    """
+    Number of units in each state.
+    """
+    return {sub: len(glob.glob(os.path.join(queue_dir, sub, 'unit_*.json'))) for sub in SUBDIRS}
+
+
+def throughput_report(queue_dir):
+    """
+    Per-shard throughput of the finished units.
+    """
+    stats = []
+    for path in sorted(glob.glob(os.path.join(queue_dir, 'done', 'unit_*.json'))):
+        with open(path) as f:
+            stats.append(json.load(f))
+    return pd.DataFrame(stats, columns=['unit', 'worker', 'rows', 'attempts', 'seconds', 'rows_per_second'])
+
+
+def merge_shards(queue_dir, output_file=None):
+    """
+    Assemble the finished shards into one dataframe (df_metrics.csv by default).
+
+    Rows are keyed on their manifest row_id, so each pair appears once and in
+    manifest order; missing rows are reported, the ones of units in failed/
+    separately from the ones not scored yet.
+    """
+    shards = sorted(glob.glob(os.path.join(queue_dir, 'done', 'unit_*.csv')))
+    if not shards:
+        raise ValueError(f"No finished shard in {queue_dir}")
+    df = pd.concat([pd.read_csv(path) for path in shards], ignore_index=True)
+    df = df.drop_duplicates(subset='row_id', keep='last').sort_values('row_id')
+
+    n_manifest = len(pd.read_csv(os.path.join(queue_dir, 'manifest.csv')))
+    failed_rows = set()
+    failed_units = sorted(glob.glob(os.path.join(queue_dir, 'failed', 'unit_*.json')))
+    for path in failed_units:
+        with open(path) as f:
+            failed_rows.update(json.load(f)['rows'])
+    failed_rows -= set(df['row_id'])
+    if failed_rows:
+        print(f"Warning: {len(failed_rows)} of {n_manifest} rows are in {len(failed_units)} "
+              f"failed units (failed/)")
+    if len(df) + len(failed_rows) < n_manifest:
+        print(f"Warning: {n_manifest - len(df) - len(failed_rows)} of {n_manifest} rows are not scored yet")
+
+    df = df.drop(columns='row_id').reset_index(drop=True)
+    if output_file is None:
+        output_file = os.path.join(SAVE_PATH, "df_metrics.csv")
+    df.to_csv(output_file, index=False)
+    print(f"Data saved to: {output_file}")
+    print(f"Rows saved: {len(df)}")
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded video scoring with a directory work queue")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('init', help="split a manifest into work units")
+    p.add_argument('manifest')
+    p.add_argument('queue_dir')
+    p.add_argument('--unit-size', type=int, default=4)
+
+    p = sub.add_parser('worker', help="score work units until the queue is empty")
+    p.add_argument('queue_dir')
+    p.add_argument('--lease-seconds', type=float, default=600)
+    p.add_argument('--max-attempts', type=int, default=3)
+
+    p = sub.add_parser('status', help="show queue state and per-shard throughput")
+    p.add_argument('queue_dir')
+
+    p = sub.add_parser('merge', help="assemble df_metrics.csv from the finished shards")
+    p.add_argument('queue_dir')
+    p.add_argument('--output')
+
+    args = parser.parse_args()
+    if args.command == 'init':
+        print(f"{init_queue(args.manifest, args.queue_dir, args.unit_size)} work units")
+    elif args.command == 'worker':
+        print(f"{run_worker(args.queue_dir, lease_seconds=args.lease_seconds, max_attempts=args.max_attempts)} units scored")
+    elif args.command == 'status':
+        print(queue_status(args.queue_dir))
+        print(throughput_report(args.queue_dir))
+    elif args.command == 'merge':
+        merge_shards(args.queue_dir, args.output)
+
+
+if __name__ == '__main__':
+    main()
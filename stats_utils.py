@@ -0,0 +1,254 @@
+import numpy as np
+import pandas as pd
+
+from mos_utils import rating_matrix
+
+
+# name of the source video for each reference label (same as in the notebooks)
+SOURCES = {
+    "Book_arrival": "Book_arrival",
+    "Lovebird": "Lovebird1",
+    "Newspaper": "Newspaper",
+}
+
+
+def reference_source(reference):
+    """
+    'Center_Book_arrival' -> 'Book_arrival', 'Right_Lovebird' -> 'Lovebird1'
+    """
+    to_cam_position, video_label = reference.split('_', 1)
+    return SOURCES.get(video_label, video_label)
+
+
+def stimulus_table(ratings):
+    """
+    One row per stimulus with its MOS, from long-format ratings.
+
+    Returns:
+    - dataframe with video, condition, Source, MOS (rows in rating_matrix order)
+    - the participant x stimulus rating matrix
+    """
+    matrix, participants, stimuli = rating_matrix(ratings)
+    table = stimuli.to_frame(index=False).rename(columns={'reference': 'video'})
+    table['Source'] = table['video'].map(reference_source)
+    table['MOS'] = np.nanmean(matrix, axis=0)
+    return table, matrix
+
+
+def permuted_labels(labels, strata, n_perm, rng):
+    """
+    Random permutations of labels, done independently inside each stratum.
+
+    Parameters:
+    - labels: integer array (S,)
+    - strata: integer array (S,), or None for an unrestricted permutation
+
+    Returns:
+    - array (n_perm, S) of permuted labels
+    """
+    if strata is None:
+        return rng.permuted(np.broadcast_to(labels, (n_perm, len(labels))), axis=1)
+    out = np.empty((n_perm, len(labels)), dtype=labels.dtype)
+    for stratum in np.unique(strata):
+        cols = np.flatnonzero(strata == stratum)
+        out[:, cols] = rng.permuted(np.broadcast_to(labels[cols], (n_perm, len(cols))), axis=1)
+    return out
+
+
+def _group_means(values, labels, n_groups):
+    # labels (n_perm, S) -> means (n_perm, n_groups)
+    n_perm = labels.shape[0]
+    flat = (labels + n_groups * np.arange(n_perm)[:, None]).ravel()
+    sums = np.bincount(flat, weights=np.tile(values, n_perm), minlength=n_perm * n_groups)
+    counts = np.bincount(labels[0], minlength=n_groups)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return sums.reshape(n_perm, n_groups) / counts
+
+
+class _Design:
+    # group sizes and sums of squares shared by all the tests below;
+    # permutations keep the group sizes, so only the group means change
+    def __init__(self, values, groups, strata):
+        values = np.asarray(values, dtype=np.float64)
+        keep = ~np.isnan(values)
+        self.codes, names = pd.factorize(np.asarray(groups)[keep], sort=True)
+        self.names = np.asarray(names)
+        self.values = values[keep]
+        self.strata = None
+        if strata is not None:
+            self.strata = pd.factorize(np.asarray(strata)[keep], sort=True)[0]
+        self.n_groups = len(self.names)
+        self.counts = np.bincount(self.codes, minlength=self.n_groups)
+        self.grand = self.values.mean()
+        self.ss_total = ((self.values - self.grand) ** 2).sum()
+        self.df_between = self.n_groups - 1
+        self.df_within = len(self.values) - self.n_groups
+        self.observed = _group_means(self.values, self.codes[None], self.n_groups)[0]
+
+    def ss_between(self, means):
+        return (self.counts * (means - self.grand) ** 2).sum(axis=-1)
+
+    def mse(self, means):
+        # pooled within-group variance
+        return (self.ss_total - self.ss_between(means)) / self.df_within
+
+    def permutations(self, n_perm, seed, chunk):
+        rng = np.random.default_rng(seed)
+        for start in range(0, n_perm, chunk):
+            labels = permuted_labels(self.codes, self.strata, min(chunk, n_perm - start), rng)
+            yield _group_means(self.values, labels, self.n_groups)
+
+
+def permutation_anova(values, groups, strata=None, n_perm=10000, seed=None, chunk=1000):
+    """
+    One-way permutation ANOVA (same F statistic as scipy.stats.f_oneway).
+
+    Returns:
+    - dict with F and p_value
+    """
+    design = _Design(values, groups, strata)
+
+    def f_stat(means):
+        return (design.ss_between(means) / design.df_between) / design.mse(means)
+
+    observed = f_stat(design.observed)
+    exceed = 0
+    for means in design.permutations(n_perm, seed, chunk):
+        exceed += (f_stat(means) >= observed).sum()
+    return {'F': observed, 'p_value': (exceed + 1) / (n_perm + 1)}
+
+
+def many_vs_control(values, groups, control='Original', strata=None, n_perm=10000,
+                    alpha=0.05, seed=None, chunk=1000):
+    """
+    Dunnett-style comparison of every group against a control group.
+
+    The statistic is the t of each group against the control with the pooled
+    variance, and its null distribution comes from permuting the group labels
+    (inside each stratum if strata is given). p_adj uses the max |t| over all
+    groups of each permutation, so it controls the family-wise error rate;
+    lower/upper are the matching simultaneous confidence limits.
+
+    Returns:
+    - dataframe with group1 (control), group2, meandiff, p_value, p_adj, lower, upper, reject
+      where meandiff = mean(group2) - mean(group1)
+    """
+    design = _Design(values, groups, strata)
+    names = design.names
+    if control not in names:
+        raise ValueError(f"Control group {control!r} not found in {list(names)}")
+    c = int(np.flatnonzero(names == control)[0])
+    others = np.array([g for g in range(design.n_groups) if g != c])
+    scale = np.sqrt(1 / design.counts[others] + 1 / design.counts[c])
+
+    def t_stat(means):
+        se = np.sqrt(design.mse(means))[..., None] * scale
+        return (means[..., others] - means[..., [c]]) / se
+
+    diff = design.observed[others] - design.observed[c]
+    t_obs = np.abs(t_stat(design.observed))
+
+    exceed = np.zeros(len(others))
+    max_null = []
+    for means in design.permutations(n_perm, seed, chunk):
+        t = np.abs(t_stat(means))
+        exceed += (t >= t_obs).sum(axis=0)
+        max_null.append(t.max(axis=1))
+    max_null = np.sort(np.concatenate(max_null))
+
+    p_adj = (n_perm - np.searchsorted(max_null, t_obs, side='left') + 1) / (n_perm + 1)
+    half_width = np.quantile(max_null, 1 - alpha) * np.sqrt(design.mse(design.observed)) * scale
+    return pd.DataFrame({
+        'group1': control,
+        'group2': names[others],
+        'meandiff': diff,
+        'p_value': (exceed + 1) / (n_perm + 1),
+        'p_adj': p_adj,
+        'lower': diff - half_width,
+        'upper': diff + half_width,
+        'reject': p_adj < alpha,
+    })
+
+
+def _max_pair_distance(means, counts):
+    # max over all pairs of |mean_g - mean_h| / sqrt((1/n_g + 1/n_h) / 2), per row of means
+    if np.all(counts == counts[0]):
+        # balanced: the largest pair is the range
+        return (np.nanmax(means, axis=1) - np.nanmin(means, axis=1)) / np.sqrt(1 / counts[0])
+    out = np.zeros(len(means))
+    for g in range(len(counts) - 1):
+        d = np.abs(means[:, g + 1:] - means[:, [g]]) / np.sqrt((1 / counts[g] + 1 / counts[g + 1:]) / 2)
+        out = np.fmax(out, np.nanmax(d, axis=1))
+    return out
+
+
+def all_pairs(values, groups, strata=None, n_perm=10000, alpha=0.05, seed=None, chunk=1000):
+    """
+    Tukey-Kramer comparison of all pairs of groups with a permutation null.
+
+    The statistic is the studentized range q = |mean_g - mean_h| / se_gh with
+    the Tukey-Kramer standard error se_gh = sqrt(MSE / 2 * (1/n_g + 1/n_h)).
+    Its family-wise null is the largest q over all pairs of each permutation;
+    for balanced designs that is the range of the permuted group means, so the
+    cost stays linear in the number of groups per permutation (quadratic
+    otherwise).
+
+    Returns:
+    - dataframe with group1, group2, meandiff, p_adj, lower, upper, reject
+      (same columns as the pairwise_tukeyhsd summary)
+    """
+    design = _Design(values, groups, strata)
+
+    q_max = []
+    for means in design.permutations(n_perm, seed, chunk):
+        q_max.append(_max_pair_distance(means, design.counts) / np.sqrt(design.mse(means)))
+    q_max = np.sort(np.concatenate(q_max))
+
+    g1, g2 = np.triu_indices(design.n_groups, k=1)
+    diff = design.observed[g2] - design.observed[g1]
+    se = np.sqrt(design.mse(design.observed) / 2 * (1 / design.counts[g1] + 1 / design.counts[g2]))
+    # number of permutations with q >= observed, via the sorted null
+    exceed = n_perm - np.searchsorted(q_max, np.abs(diff) / se, side='left')
+    p_adj = (exceed + 1) / (n_perm + 1)
+    half_width = np.quantile(q_max, 1 - alpha) * se
+    return pd.DataFrame({
+        'group1': design.names[g1],
+        'group2': design.names[g2],
+        'meandiff': diff,
+        'p_adj': p_adj,
+        'lower': diff - half_width,
+        'upper': diff + half_width,
+        'reject': p_adj < alpha,
+    })
+
+
+STRATA = {None: None, 'source': 'Source', 'reference': 'video'}
+
+
+def compare_conditions(ratings, control='Original', stratify='source', n_perm=10000,
+                       alpha=0.05, seed=None):
+    """
+    Significance tests of the conditions directly from the participant ratings.
+
+    The ratings are reduced to one MOS per stimulus (stimulus_table) and every
+    test runs on those stimulus MOS, like the notebook: the condition labels
+    are permuted across stimuli, not across individual ratings, so the cost
+    depends on the number of stimuli and not on the panel size.
+
+    Parameters:
+    - ratings: long-format ratings (data/*_samviq.csv)
+    - control: control condition for the many-vs-control comparison
+    - stratify: None, 'source' (Book_arrival/Lovebird1/Newspaper) or 'reference'
+    - n_perm: number of permutations
+
+    Returns:
+    - dict with 'anova', 'vs_control' and 'all_pairs' results
+    """
+    table, _ = stimulus_table(ratings)
+    strata = None if STRATA[stratify] is None else table[STRATA[stratify]]
+    kwargs = {'strata': strata, 'n_perm': n_perm, 'seed': seed}
+    return {
+        'anova': permutation_anova(table['MOS'], table['condition'], **kwargs),
+        'vs_control': many_vs_control(table['MOS'], table['condition'], control, alpha=alpha, **kwargs),
+        'all_pairs': all_pairs(table['MOS'], table['condition'], alpha=alpha, **kwargs),
+    }
@@ -0,0 +1,14 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def write_y4m(path, frames, width, height, colorspace='C420jpeg'):
+    # frames: flat uint8 I420 buffers
+    with open(path, 'wb') as f:
+        f.write(f'YUV4MPEG2 W{width} H{height} F25:1 Ip A1:1 {colorspace}\n'.encode())
+        for frame in frames:
+            f.write(b'FRAME\n')
+            f.write(frame.tobytes())
@@ -0,0 +1,53 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.optimize import least_squares
+
+from fit_utils import MODELS, correlations_batch, fit_batch, linear_fit_batch, stimulus_bootstrap
+from conftest import ROOT
+
+
+METRICS = ['SSIM', 'MS_SSIM', 'LPIPS', 'VIFP']
+
+
+def bootstrap_replicates(metric, n_boot=100, seed=0):
+    df = pd.read_csv(os.path.join(ROOT, 'results', 'df_metrics.csv'))
+    data = df[[metric, 'MOS']].dropna()
+    x = data[metric].to_numpy(dtype=np.float64)
+    y = data['MOS'].to_numpy(dtype=np.float64)
+    idx = stimulus_bootstrap(len(x), n_boot, np.random.default_rng(seed))
+    return x[idx], y[idx]
+
+
+def scipy_fits(x, y, model):
+    func, _, init = MODELS[model][:3]
+    t0 = init(x, y)
+    sse = np.empty(len(x))
+    fit = np.empty_like(y)
+    for i in range(len(x)):
+        res = least_squares(lambda t: y[i] - func(t[None], x[i][None])[0], t0[i], method='lm')
+        sse[i] = (res.fun ** 2).sum()
+        fit[i] = y[i] - res.fun
+    return sse, fit
+
+
+@pytest.mark.parametrize('model', ['fitfun', 'logistic_func'])
+@pytest.mark.parametrize('metric', METRICS)
+def test_fit_batch_matches_least_squares_on_replicates(metric, model):
+    x, y = bootstrap_replicates(metric)
+    params, fit = fit_batch(x, y, model)
+    sse = ((y - fit) ** 2).sum(axis=1)
+    sse_ref, fit_ref = scipy_fits(x, y, model)
+
+    # as good as scipy on almost every replicate, never worse than a straight line
+    # (logistic_func only reaches a line in the limit of a flat sigmoid)
+    assert np.mean(sse <= sse_ref * 1.01) >= 0.95
+    assert np.all(sse <= linear_fit_batch(x, y) * (1 + 1e-4))
+    mid = params[:, MODELS[model][3]]
+    assert np.all((mid >= x.min(axis=1)) & (mid <= x.max(axis=1)))
+
+    low = np.percentile(correlations_batch(fit, y)['plcc'], 2.5)
+    low_ref = np.percentile(correlations_batch(fit_ref, y)['plcc'], 2.5)
+    assert low >= low_ref - 0.02
@@ -0,0 +1,68 @@
+import socket
+import time
+
+import numpy as np
+
+from monitor_service import HEADER, LEVELS, MAGIC, QualityMonitor, synthetic_producer
+
+
+def run_producer(monitor, **kwargs):
+    address = monitor.start()
+    try:
+        synthetic_producer(address, **kwargs)
+        deadline = time.time() + 10
+        while monitor.stats()['frames'] + monitor.dropped < kwargs['n_frames'] and time.time() < deadline:
+            time.sleep(0.05)
+    finally:
+        monitor.stop()
+    return monitor.stats()
+
+
+def test_loose_budget_keeps_all_metrics():
+    stats = run_producer(QualityMonitor(budget_ms=60000, queue_size=64),
+                         n_frames=10, width=160, height=120, fps=10)
+    assert stats['frames'] == 10
+    assert stats['level'] == 0 and stats['level_changes'] == 0
+    assert set(stats['pooled']) == set(LEVELS[0])
+
+
+def test_tight_budget_drops_to_the_cheapest_level():
+    stats = run_producer(QualityMonitor(budget_ms=0.001, recover_frames=1000),
+                         n_frames=10, width=160, height=120, fps=25)
+    assert stats['level'] == len(LEVELS) - 1
+    assert stats['level_changes'] == len(LEVELS) - 1
+    assert stats['metrics'] == list(LEVELS[-1])
+    assert set(stats['pooled']) == set(LEVELS[-1])
+
+
+def test_pooled_scores_are_not_stale_after_a_level_change():
+    rng = np.random.default_rng(0)
+    ref = rng.integers(0, 256, (64, 64), dtype=np.uint8)
+    monitor = QualityMonitor(budget_ms=60000, recover_frames=1)
+    for i in range(3):
+        monitor.score_pair(ref, ref // 2, frame_id=i)
+
+    monitor.budget = 0  # next frame goes over budget
+    monitor.score_pair(ref, ref // 2, frame_id=3)
+    assert monitor.metrics == LEVELS[1]
+    assert set(monitor.stats()['pooled']) == set(LEVELS[1])
+
+    monitor.budget = 60
+    monitor.score_pair(ref, ref // 2, frame_id=4)  # calm frame: back to level 0
+    scores = monitor.score_pair(ref, ref // 3, frame_id=5)
+    assert monitor.metrics == LEVELS[0]
+    # only the frame scored since VIF_spatial came back is pooled
+    assert monitor.stats()['pooled']['VIF_spatial'] == scores['VIF_spatial']
+
+
+def test_bad_frame_size_closes_the_connection():
+    monitor = QualityMonitor()
+    address = monitor.start()
+    try:
+        with socket.create_connection(address) as conn:
+            conn.settimeout(5)
+            conn.sendall(HEADER.pack(MAGIC, 0, 100000, 100000, time.time()))
+            assert conn.recv(1) == b''
+        assert monitor.stats()['frames'] == 0
+    finally:
+        monitor.stop()
@@ -0,0 +1,103 @@
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+from conftest import ROOT
+from mos_utils import MOSAggregator, bt500_screening, screened_mos
+
+
+FILES = sorted(glob.glob(os.path.join(ROOT, 'data', '*_samviq.csv')))
+
+
+def notebook_mos(files):
+    # MOS / DMOS / CI_95 exactly as computed in samviq_analysis.ipynb
+    df = pd.concat([pd.read_csv(f) for f in files], ignore_index=True).pivot_table(
+        index=['reference', 'condition'], columns='participant', values='rating', aggfunc='first'
+    ).reset_index()
+    df.columns = ['video', 'condition'] + [f'rating_{col}' for col in df.columns[2:]]
+    rating_cols = [col for col in df.columns if col.startswith('rating_')]
+    df['MOS'] = df[rating_cols].mean(axis=1)
+    reference_mos = df[df['condition'] == 'Original'].groupby('video')['MOS'].mean()
+    df = df.join(reference_mos, on='video', rsuffix='_ref')
+    df['DMOS'] = df['MOS_ref'] - df['MOS'] + 20
+    df['CI_95'] = 1.96 * df[rating_cols].std(axis=1) / np.sqrt(len(rating_cols))
+    return df[['video', 'condition', 'MOS', 'DMOS', 'CI_95']]
+
+
+def assert_same_mos(agg, files):
+    expected = notebook_mos(files).set_index(['video', 'condition']).sort_index()
+    result = agg.results().set_index(['video', 'condition']).sort_index()
+    assert result.index.equals(expected.index)
+    for col in ['MOS', 'DMOS', 'CI_95']:
+        np.testing.assert_allclose(result[col], expected[col], rtol=1e-10)
+
+
+def test_aggregator_matches_notebook_pivot():
+    agg = MOSAggregator()
+    agg.add_directory(os.path.join(ROOT, 'data'))
+    assert agg.n_participants == len(FILES)
+    assert_same_mos(agg, FILES)
+
+
+def test_incremental_files_match_notebook_pivot(tmp_path):
+    half = len(FILES) // 2
+    agg = MOSAggregator()
+    for f in FILES[:half]:
+        agg.add_file(f)
+    assert_same_mos(agg, FILES[:half])
+
+    path = str(tmp_path / 'stats.csv')
+    agg.save(path)
+    agg = MOSAggregator.load(path)
+    assert agg.add_file(FILES[0]) == 0
+    for f in FILES:
+        agg.add_file(f)
+    assert_same_mos(agg, FILES)
+
+
+def test_later_session_adds_only_new_stimuli():
+    agg = MOSAggregator()
+    agg.add_file(FILES[0])
+    first = pd.read_csv(FILES[0])
+    session = first.head(2).assign(session=2)
+    session.loc[session.index[1], 'reference'] = 'New_sequence'
+    assert agg.add_ratings(session) == 1
+    assert agg.n_participants == 1
+
+
+def test_numeric_participants_are_not_counted_twice(tmp_path):
+    ratings = pd.read_csv(FILES[0]).assign(participant=7)
+    path = str(tmp_path / 'rater_samviq.csv')
+    ratings.to_csv(path, index=False)
+
+    agg = MOSAggregator()
+    agg.add_file(path)
+    agg.save(str(tmp_path / 'stats.csv'))
+    agg = MOSAggregator.load(str(tmp_path / 'stats.csv'))
+    agg.files.clear()
+    assert agg.add_file(path) == 0
+    assert (agg.results()['n'] == 1).all()
+
+
+def test_bt500_rejects_a_planted_outlier():
+    rng = np.random.default_rng(0)
+    true = rng.uniform(20, 80, 40)
+    matrix = true + rng.normal(0, 8, (15, 40))
+    # beyond 2 std in both directions, so P and Q stay balanced
+    matrix[3] = true + np.where(np.arange(40) % 2, 22.0, -22.0)
+
+    screen = bt500_screening(matrix)
+    assert screen['rejected'].tolist() == [i == 3 for i in range(15)]
+    assert screen['P'][3] > 0 and screen['Q'][3] > 0
+
+
+def test_screened_mos_rejects_an_inverted_observer():
+    ratings = pd.concat([pd.read_csv(f) for f in FILES], ignore_index=True)
+    _, screening = screened_mos(ratings)
+    assert screening.loc['christopher', 'corr'] < 0
+    assert screening.index[screening['rejected']].tolist() == ['christopher']
+
+    _, bt500_only = screened_mos(ratings, min_corr=None)
+    assert not bt500_only.loc['christopher', 'rejected']
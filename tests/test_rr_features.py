@@ -0,0 +1,57 @@
+import cv2 as cv
+import numpy as np
+import pytest
+
+from conftest import write_y4m
+from rr_features import extract_rr_features, load_rr_features, score_rr
+
+
+WIDTH, HEIGHT = 192, 144
+WAVELET_MODULES = {'steerable': 'pyrtools', 'haar': 'pywt'}
+
+
+def textured_clip(n_frames=3, noise=0.0):
+    # a smooth random texture panning by one pixel per frame
+    rng = np.random.default_rng(0)
+    base = cv.GaussianBlur(rng.uniform(0, 255, (HEIGHT + 8, WIDTH + 8)).astype(np.float32), (0, 0), 2)
+    base = (base - base.min()) / (base.max() - base.min()) * 255
+    chroma = np.full(WIDTH * HEIGHT // 2, 128, dtype=np.uint8)
+    frames = []
+    for i in range(n_frames):
+        y = base[i:i + HEIGHT, i:i + WIDTH] + noise * rng.normal(0, 1, (HEIGHT, WIDTH))
+        frames.append(np.concatenate([np.clip(y, 0, 255).astype(np.uint8).ravel(), chroma]))
+    return frames
+
+
+@pytest.mark.parametrize('wavelet', sorted(WAVELET_MODULES))
+def test_identical_clip_scores_one(tmp_path, wavelet):
+    pytest.importorskip(WAVELET_MODULES[wavelet])
+    ref, dis = str(tmp_path / 'ref.y4m'), str(tmp_path / 'dis.y4m')
+    write_y4m(ref, textured_clip(), WIDTH, HEIGHT)
+    write_y4m(dis, textured_clip(noise=15), WIDTH, HEIGHT)
+    features = str(tmp_path / 'features')
+
+    extract_rr_features(ref, features, wavelet=wavelet)
+    meta = load_rr_features(features)['meta']
+    assert (meta['n_frames'], meta['width'], meta['height']) == (3, WIDTH, HEIGHT)
+
+    same = score_rr(features, ref, metrics=('VIF_rr', 'VIF_spatial_rr', 'SI', 'TI'))
+    assert same['VIF_rr'] == pytest.approx(1, abs=1e-3)
+    assert same['VIF_spatial_rr'] == pytest.approx(1, abs=1e-3)
+    assert same['SI_diff'] < 1e-3 and same['TI_diff'] < 1e-3
+
+    noisy = score_rr(features, dis)
+    assert noisy['VIF_rr'] < 0.95 and noisy['VIF_spatial_rr'] < same['VIF_spatial_rr']
+
+
+def test_frame_size_must_match_the_features(tmp_path):
+    pytest.importorskip('pywt')
+    ref, other = str(tmp_path / 'ref.y4m'), str(tmp_path / 'other.y4m')
+    write_y4m(ref, textured_clip(1), WIDTH, HEIGHT)
+    small = np.zeros(WIDTH * HEIGHT * 3 // 8, dtype=np.uint8)
+    write_y4m(other, [small], WIDTH // 2, HEIGHT // 2)
+    features = str(tmp_path / 'features')
+    extract_rr_features(ref, features, wavelet='haar')
+
+    with pytest.raises(ValueError):
+        score_rr(features, other)
@@ -0,0 +1,102 @@
+import json
+import multiprocessing
+import os
+import time
+
+import pandas as pd
+
+from shard_queue import init_queue, merge_shards, queue_status, run_worker, throughput_report
+
+
+def manifest(n_rows):
+    return pd.DataFrame({'Video_path': [f'dis_{i}.avi' for i in range(n_rows)],
+                         'ref_video_path': [f'ref_{i // 4}.avi' for i in range(n_rows)]})
+
+
+def fake_score(row):
+    # stands in for score_video: deterministic values from the manifest row
+    return {'PSNR': 30.0 + int(row['Video_path'][4:-4]) / 10}
+
+
+def slow_score(row):
+    time.sleep(60)
+    return fake_score(row)
+
+
+def long_row_score(row):
+    time.sleep(1.5)
+    return fake_score(row)
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.05)
+
+
+def test_killed_worker_rows_are_rescored_once(tmp_path):
+    queue_dir = str(tmp_path / 'queue')
+    n_units = init_queue(manifest(10), queue_dir, unit_size=3)
+
+    ctx = multiprocessing.get_context('spawn')
+    doomed = ctx.Process(target=run_worker, args=(queue_dir, slow_score), kwargs={'lease_seconds': 0.5})
+    doomed.start()
+    wait_for(lambda: queue_status(queue_dir)['leased'] == 1)
+    doomed.kill()
+    doomed.join()
+
+    assert run_worker(queue_dir, fake_score, lease_seconds=0.5) == n_units
+    assert queue_status(queue_dir) == {'pending': 0, 'leased': 0, 'done': n_units, 'failed': 0}
+
+    df = merge_shards(queue_dir, str(tmp_path / 'df_metrics.csv'))
+    assert df['Video_path'].tolist() == manifest(10)['Video_path'].tolist()
+    assert df['PSNR'].tolist() == [30.0 + i / 10 for i in range(10)]
+    # the killed worker's unit was requeued once
+    assert sorted(throughput_report(queue_dir)['attempts']) == [1] * (n_units - 1) + [2]
+
+
+def test_long_rows_keep_their_lease(tmp_path):
+    queue_dir = str(tmp_path / 'queue')
+    n_units = init_queue(manifest(2), queue_dir, unit_size=1)
+
+    # the third worker finds nothing to claim and watches the leases of the other two
+    ctx = multiprocessing.get_context('spawn')
+    workers = [ctx.Process(target=run_worker, args=(queue_dir, long_row_score),
+                           kwargs={'lease_seconds': 1.0, 'max_attempts': 2})
+               for _ in range(3)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join(timeout=30)
+        assert w.exitcode == 0
+
+    assert queue_status(queue_dir) == {'pending': 0, 'leased': 0, 'done': n_units, 'failed': 0}
+    assert throughput_report(queue_dir)['attempts'].tolist() == [1] * n_units
+    for unit in range(n_units):
+        with open(os.path.join(queue_dir, 'done', f'unit_{unit:06d}.json')) as f:
+            assert json.load(f)['rows'] == 1
+
+
+def missing_video_score(row):
+    if row['Video_path'] == 'dis_4.avi':
+        raise FileNotFoundError(row['Video_path'])
+    return fake_score(row)
+
+
+def test_failing_unit_is_retried_without_waiting_for_its_lease(tmp_path, capsys):
+    queue_dir = str(tmp_path / 'queue')
+    n_units = init_queue(manifest(9), queue_dir, unit_size=3)
+
+    start = time.time()
+    assert run_worker(queue_dir, missing_video_score, lease_seconds=2, max_attempts=3) == n_units - 1
+    assert time.time() - start < 2
+    assert queue_status(queue_dir) == {'pending': 0, 'leased': 0, 'done': n_units - 1, 'failed': 1}
+    with open(os.path.join(queue_dir, 'failed', 'unit_000001.json')) as f:
+        assert json.load(f)['attempts'] == 3
+
+    df = merge_shards(queue_dir, str(tmp_path / 'df_metrics.csv'))
+    assert len(df) == 6
+    out = capsys.readouterr().out
+    assert '3 of 9 rows are in 1 failed units' in out
+    assert 'not scored yet' not in out
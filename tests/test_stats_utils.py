@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from scipy.stats import dunnett
+
+from stats_utils import all_pairs, many_vs_control, permuted_labels
+
+
+def unbalanced_design():
+    rng = np.random.default_rng(1)
+    counts = [6, 9, 12, 8, 15]
+    shifts = [0.0, 0.3, 0.9, 1.4, 0.5]
+    groups = np.repeat(list('ABCDE'), counts)
+    values = np.concatenate([rng.normal(s, 1, n) for s, n in zip(shifts, counts)])
+    return values, groups
+
+
+def test_all_pairs_matches_pairwise_tukeyhsd():
+    multicomp = pytest.importorskip('statsmodels.stats.multicomp')
+    values, groups = unbalanced_design()
+    result = all_pairs(values, groups, n_perm=20000, seed=0)
+    tukey = multicomp.pairwise_tukeyhsd(values, groups)
+
+    np.testing.assert_allclose(result['meandiff'], tukey.meandiffs)
+    np.testing.assert_allclose(result['p_adj'], tukey.pvalues, atol=0.01)
+    np.testing.assert_allclose(result[['lower', 'upper']], tukey.confint, atol=0.05)
+    assert result['reject'].tolist() == list(tukey.reject)
+
+
+def test_many_vs_control_matches_dunnett():
+    values, groups = unbalanced_design()
+    result = many_vs_control(values, groups, control='A', n_perm=20000, seed=0)
+    others = [values[groups == g] for g in 'BCDE']
+    expected = dunnett(*others, control=values[groups == 'A'])
+    ci = expected.confidence_interval()
+
+    np.testing.assert_allclose(result['p_adj'], expected.pvalue, atol=0.01)
+    np.testing.assert_allclose(result['lower'], ci.low, atol=0.05)
+    np.testing.assert_allclose(result['upper'], ci.high, atol=0.05)
+
+
+def test_stratified_permutations_keep_counts_per_stratum():
+    rng = np.random.default_rng(0)
+    labels = rng.integers(0, 4, 60)
+    strata = rng.integers(0, 3, 60)
+    permuted = permuted_labels(labels, strata, 500, rng)
+
+    assert not (permuted == labels).all(axis=1).all()
+    for stratum in range(3):
+        cols = strata == stratum
+        expected = np.bincount(labels[cols], minlength=4)
+        counts = np.stack([np.bincount(row, minlength=4) for row in permuted[:, cols]])
+        assert (counts == expected).all()
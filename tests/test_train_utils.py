@@ -0,0 +1,44 @@
+import glob
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import train_utils
+from train_utils import cross_validate
+
+
+def synthetic_scores():
+    rng = np.random.default_rng(0)
+    metric = rng.uniform(0, 1, 60)
+    return pd.DataFrame({
+        'Source': np.repeat(['a', 'b', 'c'], 20),
+        'PSNR': metric,
+        'SSIM': metric + rng.normal(0, 0.1, 60),
+        'MOS': 20 + 60 * metric + rng.normal(0, 5, 60),
+    })
+
+
+def test_model_cache_is_versioned(tmp_path, monkeypatch):
+    df = synthetic_scores()
+    cache_dir = str(tmp_path)
+    _, first, _ = cross_validate(df, n_jobs=1, cache_dir=cache_dir)
+    pickles = set(glob.glob(os.path.join(cache_dir, '*.pkl')))
+    assert len(pickles) == len(first) * 3
+
+    # same code: every model comes from the cache
+    _, again, _ = cross_validate(df, n_jobs=1, cache_dir=cache_dir)
+    assert set(glob.glob(os.path.join(cache_dir, '*.pkl'))) == pickles
+    pd.testing.assert_frame_equal(first, again)
+
+    # the key inputs are stored next to each model
+    with open(next(iter(pickles))[:-len('.pkl')] + '.json') as f:
+        inputs = json.load(f)
+    assert inputs['version'] == train_utils.CACHE_VERSION
+    assert inputs['n_train'] == 40
+
+    # changed fitting code: nothing is reused
+    monkeypatch.setattr(train_utils, 'CACHE_VERSION', 'changed')
+    cross_validate(df, n_jobs=1, cache_dir=cache_dir)
+    assert len(set(glob.glob(os.path.join(cache_dir, '*.pkl'))) - pickles) == len(pickles)
@@ -0,0 +1,100 @@
+import io
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import video_io
+from conftest import write_y4m
+from video_io import Y4MReader, YUVReader, frame_size, open_video
+from video_metrics import analyze_video_SI_TI
+
+
+def random_frames(n, width, height, seed=0):
+    rng = np.random.default_rng(seed)
+    return [rng.integers(0, 256, frame_size(width, height), dtype=np.uint8) for _ in range(n)]
+
+
+def test_raw_yuv_planes_with_odd_size(tmp_path):
+    width, height = 5, 3
+    frames = random_frames(3, width, height)
+    path = tmp_path / 'clip.yuv'
+    path.write_bytes(b''.join(f.tobytes() for f in frames) + b'\x00' * 7)
+
+    with open_video(str(path), width, height) as reader:
+        read = list(reader)
+    assert len(read) == 3  # the trailing partial frame is dropped
+    y_size, c_size = width * height, 3 * 2
+    for frame, data in zip(read, frames):
+        np.testing.assert_array_equal(frame.y.ravel(), data[:y_size])
+        np.testing.assert_array_equal(frame.u.ravel(), data[y_size:y_size + c_size])
+        np.testing.assert_array_equal(frame.v.ravel(), data[y_size + c_size:])
+
+    with pytest.raises(ValueError):
+        open_video(str(path))
+
+
+def test_y4m_header_and_frames(tmp_path):
+    width, height = 16, 8
+    frames = random_frames(4, width, height)
+    path = tmp_path / 'clip.y4m'
+    write_y4m(path, frames, width, height)
+
+    for reader in [open_video(str(path)), open_video(path), open_video(path, width, height),
+                   open_video(io.BytesIO(path.read_bytes()))]:
+        assert isinstance(reader, Y4MReader)
+        assert (reader.width, reader.height, reader.fps) == (width, height, 25.0)
+        read = list(reader)
+        reader.close()
+        assert len(read) == 4
+        for frame, data in zip(read, frames):
+            np.testing.assert_array_equal(frame.buffer, data)
+
+    with open_video(path, max_frames=2) as reader:
+        assert len(list(reader)) == 2
+
+
+@pytest.mark.parametrize('header', ['YUV4MPEG2 W16 H8 C420p10\n', 'YUV4MPEG2 W16 H8 C444\n',
+                                    'YUV4MPEG2 H8\n', 'RIFF\n'])
+def test_y4m_rejects_unsupported_streams_and_closes_them(tmp_path, monkeypatch, header):
+    path = tmp_path / 'clip.y4m'
+    path.write_bytes(header.encode() + b'FRAME\n' + bytes(frame_size(16, 8) * 2))
+    opened = []
+
+    def tracking_open(*args, **kwargs):
+        opened.append(open(*args, **kwargs))
+        return opened[-1]
+
+    monkeypatch.setattr(video_io, 'open', tracking_open, raising=False)
+    with pytest.raises(ValueError):
+        Y4MReader(str(path))
+    assert len(opened) == 1 and opened[0].closed
+
+
+def test_raw_reader_reads_a_pipe_in_pieces():
+    width, height = 8, 4
+    frames = random_frames(2, width, height)
+
+    class Pipe(io.RawIOBase):
+        # hands out at most 5 bytes per read, like a slow pipe
+        def __init__(self, data):
+            self.data = io.BytesIO(data)
+
+        def readinto(self, buffer):
+            chunk = self.data.read(min(5, len(buffer)))
+            buffer[:len(chunk)] = chunk
+            return len(chunk)
+
+    reader = YUVReader(Pipe(b''.join(f.tobytes() for f in frames)), width, height)
+    read = list(reader)
+    assert len(read) == 2
+    np.testing.assert_array_equal(read[1].buffer, frames[1])
+
+
+def test_si_ti_reads_every_frame_without_max_frames(tmp_path):
+    width, height = 32, 16
+    path = tmp_path / 'clip.y4m'
+    write_y4m(path, random_frames(5, width, height), width, height)
+
+    assert analyze_video_SI_TI(Path(path), max_frames=None) == analyze_video_SI_TI(str(path), max_frames=5)
+    assert analyze_video_SI_TI(str(path), max_frames=None) != analyze_video_SI_TI(str(path), max_frames=2)
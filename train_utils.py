@@ -0,0 +1,218 @@
+import hashlib
+import json
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import sklearn
+from scipy.stats import pearsonr, spearmanr
+from sklearn.base import BaseEstimator, RegressorMixin, clone
+from sklearn.linear_model import Ridge
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.svm import SVR
+
+import fit_utils
+from fit_utils import MODELS, fit_batch
+
+
+METRICS = ['SSIM', 'MS_SSIM', 'LPIPS', 'VIFP', 'PSNR']
+CONTENT_FEATURES = ['SI_mean', 'TI_mean']
+
+
+class LogisticMapping(BaseEstimator, RegressorMixin):
+    """
+    Single-metric logistic mapping to MOS (fitfun or logistic_func), as an sklearn estimator.
+    """
+
+    def __init__(self, model='fitfun'):
+        self.model = model
+
+    def fit(self, X, y):
+        x = np.asarray(X, dtype=np.float64)[:, 0]
+        self.params_, _ = fit_batch(x[None], np.asarray(y, dtype=np.float64)[None], self.model)
+        return self
+
+    def predict(self, X):
+        x = np.asarray(X, dtype=np.float64)[:, 0]
+        return MODELS[self.model][0](self.params_, x[None])[0]
+
+
+def default_candidates(df, metrics=METRICS, content_features=CONTENT_FEATURES):
+    """
+    Logistic mapping of every available metric plus small fusion regressors.
+
+    Returns:
+    - dict name -> (feature columns, unfitted estimator)
+    """
+    metrics = [m for m in metrics if m in df.columns]
+    features = metrics + [f for f in content_features if f in df.columns]
+
+    candidates = {}
+    for metric in metrics:
+        candidates[metric] = ([metric], LogisticMapping('fitfun'))
+        candidates[f'{metric}_4p'] = ([metric], LogisticMapping('logistic_func'))
+    if len(features) > 1:
+        candidates['fusion_ridge'] = (features, make_pipeline(StandardScaler(), Ridge(alpha=1.0)))
+        candidates['fusion_svr'] = (features, make_pipeline(StandardScaler(), SVR(C=10.0, epsilon=1.0)))
+    return candidates
+
+
+def group_folds(groups):
+    """
+    Leave-one-group-out folds (e.g. leave-one-source-out with df['Source']).
+
+    Returns:
+    - list of (held-out group, train row positions, test row positions)
+    """
+    groups = np.asarray(groups)
+    return [(g, np.flatnonzero(groups != g), np.flatnonzero(groups == g))
+            for g in pd.unique(groups)]
+
+
+def _code_version():
+    # the fitting code is part of every cached model: a change to fit_utils,
+    # this module or sklearn invalidates the whole cache
+    h = hashlib.sha1(f'sklearn {sklearn.__version__} numpy {np.__version__}'.encode())
+    for path in (fit_utils.__file__, __file__):
+        with open(path, 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+CACHE_VERSION = _code_version()
+
+
+def _cache_inputs(estimator, X, y):
+    # everything a cached model depends on; stored as <key>.json next to <key>.pkl
+    data = hashlib.sha1()
+    data.update(repr((X.shape, y.shape)).encode())
+    data.update(np.ascontiguousarray(X).tobytes())
+    data.update(np.ascontiguousarray(y).tobytes())
+    return {
+        'version': CACHE_VERSION,
+        'sklearn': sklearn.__version__,
+        'estimator': type(estimator).__name__,
+        'params': repr(sorted(estimator.get_params(deep=True).items(), key=lambda kv: kv[0])),
+        'n_train': len(y),
+        'data': data.hexdigest(),
+    }
+
+
+def _cache_key(inputs):
+    return hashlib.sha1(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+
+def _fit_predict(task):
+    # runs in a worker process; tasks only carry arrays and an unfitted estimator
+    name, fold, estimator, X_train, y_train, X_test, cache_dir = task
+    path = None
+    if cache_dir is not None:
+        inputs = _cache_inputs(estimator, X_train, y_train)
+        path = os.path.join(cache_dir, _cache_key(inputs))
+        if os.path.exists(path + '.pkl'):
+            with open(path + '.pkl', 'rb') as f:
+                fitted = pickle.load(f)
+            return name, fold, fitted.predict(X_test), fitted
+
+    fitted = clone(estimator).fit(X_train, y_train)
+    if path is not None:
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(dict(inputs, candidate=name, fold=str(fold)), f, indent=1)
+        os.replace(tmp, path + '.json')
+        with open(tmp, 'wb') as f:
+            pickle.dump(fitted, f)
+        os.replace(tmp, path + '.pkl')
+    return name, fold, fitted.predict(X_test), fitted
+
+
+def _correlations(pred, y):
+    # PLCC / SROCC of one fold; NaN when undefined (constant predictions, < 2 rows)
+    if len(y) < 2 or np.ptp(pred) == 0 or np.ptp(y) == 0:
+        return np.nan, np.nan
+    return pearsonr(pred, y)[0], spearmanr(pred, y).correlation
+
+
+def cross_validate(df, candidates=None, mos_col='MOS', group_col='Source',
+                   n_jobs=None, cache_dir=None):
+    """
+    Content-grouped cross-validation of metric-to-MOS mappings and fusion models.
+
+    Every (candidate, fold) pair is fitted in parallel in worker processes;
+    fitted models are cached in cache_dir (keyed on the estimator and its
+    training data), so re-running with more candidates only fits the new ones.
+    The key also includes CACHE_VERSION (a hash of the fit_utils/train_utils
+    source and the sklearn version), so models fitted by older code are not
+    reused; <key>.json next to each <key>.pkl records what it was fitted on.
+
+    Rows with a missing feature or MOS are left out of that candidate's folds
+    (its MOS_cv_<name> stays NaN there). The single-metric candidates are
+    fitted with fit_batch and share its limits: on a few stimuli per fold the
+    best mapping can be a sharp step, whose held-out predictions may be
+    constant, and those folds get a NaN correlation in the fold means.
+
+    Parameters:
+    - df: one row per stimulus (e.g. df_metrics)
+    - candidates: dict name -> (feature columns, estimator), default_candidates(df) if None
+    - mos_col: subjective score column
+    - group_col: column defining the folds (leave-one-source-out by default)
+    - n_jobs: number of worker processes (1 = no pool)
+    - cache_dir: directory for the fitted models, None to disable
+
+    Returns:
+    - predictions: copy of df with held-out MOS_cv_<name> columns
+    - summary: dataframe with held-out PLCC/SROCC per candidate (pooled and per fold)
+      and n, the number of rows with a held-out prediction
+    - models: dict (name, held-out group) -> fitted estimator
+    """
+    if candidates is None:
+        candidates = default_candidates(df)
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+
+    groups = df[group_col].to_numpy()
+    y = df[mos_col].to_numpy(dtype=np.float64)
+
+    # each candidate only uses the rows where its features and the MOS are all present
+    tasks = []
+    test_rows = {}
+    for name, (features, estimator) in candidates.items():
+        X = df[features].to_numpy(dtype=np.float64)
+        complete = np.flatnonzero(~np.isnan(X).any(axis=1) & ~np.isnan(y))
+        for group, train, test in group_folds(groups[complete]):
+            train, test = complete[train], complete[test]
+            test_rows[(name, group)] = test
+            tasks.append((name, group, estimator, X[train], y[train], X[test], cache_dir))
+
+    if n_jobs == 1:
+        results = list(map(_fit_predict, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            results = list(pool.map(_fit_predict, tasks))
+
+    predictions = df.copy()
+    models = {}
+    for name in candidates:
+        predictions[f'MOS_cv_{name}'] = np.nan
+    for name, group, pred, fitted in results:
+        predictions.iloc[test_rows[(name, group)], predictions.columns.get_loc(f'MOS_cv_{name}')] = pred
+        models[(name, group)] = fitted
+
+    rows = []
+    for name in candidates:
+        pred = predictions[f'MOS_cv_{name}'].to_numpy()
+        scored = ~np.isnan(pred)
+        row = {'model': name, 'features': ', '.join(candidates[name][0]), 'n': int(scored.sum()),
+               'plcc': pearsonr(pred[scored], y[scored])[0],
+               'srocc': spearmanr(pred[scored], y[scored]).correlation}
+        per_fold = [_correlations(pred[test], y[test])
+                    for (n, _), test in test_rows.items() if n == name]
+        row['plcc_fold_mean'] = np.mean([p for p, _ in per_fold])
+        row['srocc_fold_mean'] = np.mean([s for _, s in per_fold])
+        row['rmse'] = np.sqrt(np.mean((pred[scored] - y[scored]) ** 2))
+        rows.append(row)
+    summary = pd.DataFrame(rows).sort_values('plcc', ascending=False).reset_index(drop=True)
+    return predictions, summary, models
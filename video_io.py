@@ -0,0 +1,222 @@
+import os
+import sys
+
+import numpy as np
+import cv2 as cv
+
+
+class YUVFrame:
+    """
+    One planar YUV 4:2:0 frame backed by a single buffer.
+
+    y, u and v are views into that buffer (no copy); the RGB conversion is
+    only done for the metrics that need it.
+    """
+
+    def __init__(self, buffer, width, height):
+        self.buffer = buffer
+        self.width = width
+        self.height = height
+        size = width * height
+        cw, ch = (width + 1) // 2, (height + 1) // 2
+        self.y = buffer[:size].reshape(height, width)
+        self.u = buffer[size:size + cw * ch].reshape(ch, cw)
+        self.v = buffer[size + cw * ch:size + 2 * cw * ch].reshape(ch, cw)
+
+    def gray(self):
+        return self.y
+
+    def rgb(self):
+        return cv.cvtColor(self.buffer.reshape(self.height * 3 // 2, self.width), cv.COLOR_YUV2RGB_I420)
+
+    def bgr(self):
+        return cv.cvtColor(self.buffer.reshape(self.height * 3 // 2, self.width), cv.COLOR_YUV2BGR_I420)
+
+
+class CaptureFrame(YUVFrame):
+    """
+    YUVFrame from an image decoded by OpenCV.
+
+    The luma is full range (COLOR_BGR2GRAY, as in the notebooks) so the
+    metrics match the ones computed on the decoded frames; the decoded BGR
+    image is kept for rgb() / bgr().
+    """
+
+    def __init__(self, image):
+        height, width = image.shape[:2]
+        buffer = cv.cvtColor(image, cv.COLOR_BGR2YUV_I420).reshape(-1)
+        buffer[:width * height] = cv.cvtColor(image, cv.COLOR_BGR2GRAY).reshape(-1)
+        super().__init__(buffer, width, height)
+        self.image = image
+
+    def rgb(self):
+        return cv.cvtColor(self.image, cv.COLOR_BGR2RGB)
+
+    def bgr(self):
+        return self.image
+
+
+def frame_size(width, height):
+    return width * height + 2 * ((width + 1) // 2) * ((height + 1) // 2)
+
+
+def _read_exact(stream, buffer):
+    # readinto can return less than asked on pipes
+    view = memoryview(buffer)
+    filled = 0
+    while filled < len(view):
+        n = stream.readinto(view[filled:])
+        if not n:
+            break
+        filled += n
+    return filled
+
+
+class YUVReader:
+    """
+    Reader for raw planar YUV 4:2:0 (I420) files or pipes.
+
+    Parameters:
+    - source: path, '-' for stdin, or a binary file object
+    - width, height: frame size (raw files have no header)
+    - max_frames: stop after this many frames
+    """
+
+    def __init__(self, source, width, height, max_frames=None):
+        self.width = width
+        self.height = height
+        self.max_frames = max_frames
+        self._stream, self._owned = _open_stream(source)
+        self.frame_bytes = frame_size(width, height)
+
+    def _next_header(self):
+        return True
+
+    def __iter__(self):
+        count = 0
+        while self.max_frames is None or count < self.max_frames:
+            if not self._next_header():
+                break
+            buffer = np.empty(self.frame_bytes, dtype=np.uint8)
+            if _read_exact(self._stream, buffer) < self.frame_bytes:
+                break
+            yield YUVFrame(buffer, self.width, self.height)
+            count += 1
+
+    def close(self):
+        if self._owned:
+            self._stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+# 8-bit 4:2:0 chroma sitings; C420p10 / C420p12 have 16-bit samples
+Y4M_COLORSPACES = {'420', '420jpeg', '420paldv', '420mpeg2'}
+
+
+class Y4MReader(YUVReader):
+    """
+    Reader for YUV4MPEG2 (.y4m) files or pipes, 4:2:0 8-bit only.
+    """
+
+    def __init__(self, source, max_frames=None):
+        stream, owned = _open_stream(source)
+        try:
+            self._parse_header(stream.readline(), source)
+        except Exception:
+            if owned:
+                stream.close()
+            raise
+        self.max_frames = max_frames
+        self._stream, self._owned = stream, owned
+        self.frame_bytes = frame_size(self.width, self.height)
+
+    def _parse_header(self, line, source):
+        header = line.decode('ascii', errors='replace').split()
+        if not header or header[0] != 'YUV4MPEG2':
+            raise ValueError(f"Not a YUV4MPEG2 stream: {source}")
+        params = {token[0]: token[1:] for token in header[1:]}
+        colorspace = params.get('C', '420jpeg')
+        if colorspace not in Y4M_COLORSPACES:
+            raise ValueError(f"Unsupported Y4M colorspace: C{colorspace} (only 8-bit 4:2:0)")
+        if 'W' not in params or 'H' not in params:
+            raise ValueError(f"Y4M header without frame size: {source}")
+
+        self.fps = None
+        if 'F' in params:
+            num, den = params['F'].split(':')
+            self.fps = int(num) / int(den)
+        self.width = int(params['W'])
+        self.height = int(params['H'])
+
+    def _next_header(self):
+        line = self._stream.readline()
+        return line.startswith(b'FRAME')
+
+
+class CaptureReader:
+    """
+    Fallback reader for containers OpenCV can decode (AVI, ...), returning YUVFrame too.
+    """
+
+    def __init__(self, path, max_frames=None):
+        self.path = os.fspath(path)
+        self.max_frames = max_frames
+        self._cap = cv.VideoCapture(self.path)
+        if not self._cap.isOpened():
+            raise IOError(f"Error opening video: {path}")
+
+    def __iter__(self):
+        count = 0
+        while self.max_frames is None or count < self.max_frames:
+            ret, frame = self._cap.read()
+            if not ret:
+                break
+            yield CaptureFrame(frame)
+            count += 1
+
+    def close(self):
+        self._cap.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _open_stream(source):
+    if source == '-':
+        return sys.stdin.buffer, False
+    if isinstance(source, (str, os.PathLike)):
+        return open(source, 'rb'), True
+    return source, False
+
+
+def open_video(source, width=None, height=None, max_frames=None):
+    """
+    Open a video source and return a reader yielding YUVFrame objects.
+
+    Parameters:
+    - source: path (.y4m, .yuv or any container OpenCV reads), '-' for stdin,
+      or a binary file object (Y4M, or raw YUV if width and height are given)
+    - width, height: needed for raw .yuv input
+    - max_frames: stop after this many frames
+    """
+    is_path = isinstance(source, (str, os.PathLike)) and source != '-'
+    ext = os.path.splitext(os.fspath(source))[1].lower() if is_path else None
+    if width is not None and height is not None:
+        if ext == '.y4m':
+            return Y4MReader(source, max_frames)
+        return YUVReader(source, width, height, max_frames)
+    if not is_path:
+        return Y4MReader(source, max_frames)
+    if ext == '.y4m':
+        return Y4MReader(source, max_frames)
+    if ext == '.yuv':
+        raise ValueError(f"Raw YUV input needs width and height: {source}")
+    return CaptureReader(source, max_frames)
@@ -0,0 +1,183 @@
+import numpy as np
+import cv2 as cv
+from skimage.metrics import peak_signal_noise_ratio as psnr
+from skimage.metrics import structural_similarity as ssim
+
+from video_io import open_video, YUVReader, CaptureReader
+from vif_utilis import vif, vif_spatial
+
+
+def as_reader(source, width=None, height=None, max_frames=None):
+    """
+    Return source unchanged if it is already a reader, else open it with open_video.
+    """
+    if isinstance(source, (YUVReader, CaptureReader)):
+        return source
+    return open_video(source, width, height, max_frames)
+
+
+def calculate_SI(frame):
+    """
+    Calculate Spatial Information (SI) for a frame.
+    SI measures the spatial complexity/detail in the frame.
+
+    SI = std(Sobel(frame))
+    Higher SI = more spatial detail/edges
+    """
+    # Convert to grayscale if needed
+    if len(frame.shape) == 3:
+        gray = cv.cvtColor(frame, cv.COLOR_BGR2GRAY)
+    else:
+        gray = frame
+
+    sobel_x = cv.Sobel(gray, cv.CV_64F, 1, 0, ksize=3)
+    sobel_y = cv.Sobel(gray, cv.CV_64F, 0, 1, ksize=3)
+    sobel = np.sqrt(sobel_x**2 + sobel_y**2)
+
+    return np.std(sobel)
+
+
+def calculate_TI(frame1, frame2):
+    """
+    Calculate Temporal Information (TI) between two consecutive frames.
+    TI measures the amount of motion/change between frames.
+
+    TI = std(frame_diff)
+    Higher TI = more motion/temporal change
+    """
+    if len(frame1.shape) == 3:
+        gray1 = cv.cvtColor(frame1, cv.COLOR_BGR2GRAY)
+        gray2 = cv.cvtColor(frame2, cv.COLOR_BGR2GRAY)
+    else:
+        gray1 = frame1
+        gray2 = frame2
+
+    return np.std(frame_diff(gray1, gray2))
+
+
+def frame_diff(frame1, frame2):
+    """
+    Signed difference frame2 - frame1, the temporal gradient used by TI and the temporal metrics.
+    """
+    return frame2.astype(np.float64) - frame1.astype(np.float64)
+
+
+def summarize_SI_TI(si_values, ti_values):
+    """
+    Mean, max and 95th percentile of SI and TI, same order as analyze_video_SI_TI.
+    """
+    mean_si = np.mean(si_values) if si_values else 0
+    max_si = np.max(si_values) if si_values else 0
+    mean_ti = np.mean(ti_values) if ti_values else 0
+    max_ti = np.max(ti_values) if ti_values else 0
+    p95_si = np.percentile(si_values, 95) if si_values else 0
+    p95_ti = np.percentile(ti_values, 95) if ti_values else 0
+    return mean_si, max_si, p95_si, mean_ti, max_ti, p95_ti
+
+
+def analyze_video_SI_TI(video_path, max_frames=300, width=None, height=None):
+    """
+    Analyze a video and return its SI and TI values.
+
+    Parameters:
+    - video_path: AVI, Y4M or raw YUV path, '-' for stdin, or a reader from open_video
+    - max_frames: maximum number of frames to analyze (for efficiency), None for all
+    - width, height: frame size for raw YUV input
+
+    Returns:
+    - mean_si, max_si, p95_si, mean_ti, max_ti, p95_ti
+    """
+    reader = as_reader(video_path, width, height, max_frames)
+
+    si_values = []
+    ti_values = []
+    prev_y = None
+    for frame in reader:
+        # a reader passed in was opened with its own max_frames
+        if max_frames is not None and len(si_values) >= max_frames:
+            break
+        # the luma plane is used directly, no BGR round trip
+        si_values.append(calculate_SI(frame.y))
+        if prev_y is not None:
+            ti_values.append(calculate_TI(prev_y, frame.y))
+        prev_y = frame.y
+    reader.close()
+
+    return summarize_SI_TI(si_values, ti_values)
+
+
+# per-frame metrics on a pair of YUVFrame; luma only unless the metric needs RGB
+FRAME_METRICS = {
+    'PSNR': lambda ref, dis: psnr(ref.y, dis.y, data_range=255),
+    'SSIM': lambda ref, dis: ssim(ref.y, dis.y, data_range=255),
+    'VIF': lambda ref, dis: vif(ref.y.astype(np.float32), dis.y.astype(np.float32)),
+    'VIF_spatial': lambda ref, dis: vif_spatial(ref.y, dis.y),
+}
+
+# temporal metrics on the luma frame differences (current - previous) of ref and distorted
+TEMPORAL_METRICS = {
+    # mean absolute difference between the temporal gradients, flicker shows up here
+    'TG_diff': lambda ref_diff, dis_diff: np.mean(np.abs(dis_diff - ref_diff)),
+    # vif_spatial applied to the frame differences instead of the frames
+    'TVIF': lambda ref_diff, dis_diff: vif_spatial(ref_diff, dis_diff),
+}
+
+
+def score_video(ref_source, dis_source, metrics=('PSNR', 'SSIM'), frame_sample_rate=1,
+                width=None, height=None, max_frames=None):
+    """
+    Compute several full-reference metrics in one pass over a pair of videos.
+
+    Only the previous luma plane of each video is kept, and the distorted
+    frame difference is computed once per frame for both TI and the
+    temporal metrics.
+
+    Parameters:
+    - ref_source, dis_source: AVI, Y4M or raw YUV paths, '-' for stdin, or readers
+    - metrics: names from FRAME_METRICS and TEMPORAL_METRICS, plus 'SI' / 'TI' of the distorted video
+    - frame_sample_rate: compute the FRAME_METRICS and TEMPORAL_METRICS every Nth frame
+      (SI/TI use all frames)
+    - width, height: frame size for raw YUV input
+
+    Returns:
+    - dict metric -> mean over frames (SI/TI -> the analyze_video_SI_TI summary)
+    """
+    frame_metrics = [m for m in metrics if m in FRAME_METRICS]
+    temporal_metrics = [m for m in metrics if m in TEMPORAL_METRICS]
+    unknown = set(metrics) - set(FRAME_METRICS) - set(TEMPORAL_METRICS) - {'SI', 'TI'}
+    if unknown:
+        raise ValueError(f"Unknown metrics: {sorted(unknown)}")
+    content = 'SI' in metrics or 'TI' in metrics
+
+    ref_reader = as_reader(ref_source, width, height, max_frames)
+    dis_reader = as_reader(dis_source, width, height, max_frames)
+    scores = {m: [] for m in frame_metrics + temporal_metrics}
+    si_values, ti_values = [], []
+    prev_ref_y, prev_dis_y = None, None
+
+    for frame_idx, (f_ref, f_dis) in enumerate(zip(ref_reader, dis_reader)):
+        sampled = frame_idx % frame_sample_rate == 0
+        if sampled:
+            for m in frame_metrics:
+                scores[m].append(FRAME_METRICS[m](f_ref, f_dis))
+
+        if prev_dis_y is not None and (content or (temporal_metrics and sampled)):
+            dis_diff = frame_diff(prev_dis_y, f_dis.y)
+            if content:
+                ti_values.append(np.std(dis_diff))
+            if temporal_metrics and sampled:
+                ref_diff = frame_diff(prev_ref_y, f_ref.y)
+                for m in temporal_metrics:
+                    scores[m].append(TEMPORAL_METRICS[m](ref_diff, dis_diff))
+        if content:
+            si_values.append(calculate_SI(f_dis.y))
+        prev_ref_y, prev_dis_y = f_ref.y, f_dis.y
+
+    ref_reader.close()
+    dis_reader.close()
+
+    results = {m: float(np.mean(v)) if v else None for m, v in scores.items()}
+    if content:
+        keys = ['SI_mean', 'SI_max', 'SI_p95', 'TI_mean', 'TI_max', 'TI_p95']
+        results.update(zip(keys, summarize_SI_TI(si_values, ti_values)))
+    return results
@@ -123,36 +123,38 @@ def vif_channel_est(pyr_ref, pyr_dist, subband_keys, M):
     return g_all, sigma_vsq_all
 
 
-def vif(img_ref, img_dist, wavelet='steerable', full=False):
+def vif_pyramid(img, wavelet='steerable'):
     assert wavelet in ['steerable', 'haar', 'db2', 'bio2.2'], 'Invalid choice of wavelet'
-    M = 3
-    sigma_nsq = 0.1
 
     if wavelet == 'steerable':
         from pyrtools.pyramids import SteerablePyramidSpace as SPyr
-        pyr_ref = SPyr(img_ref, 4, 5, 'reflect1').pyr_coeffs
-        pyr_dist = SPyr(img_dist, 4, 5, 'reflect1').pyr_coeffs
+        pyr = SPyr(img, 4, 5, 'reflect1').pyr_coeffs
         subband_keys = []
-        for key in list(pyr_ref.keys())[1:-2:3]:
+        for key in list(pyr.keys())[1:-2:3]:
             subband_keys.append(key)
     else:
         from pywt import wavedec2
-        ret_ref = wavedec2(img_ref, wavelet, 'reflect', 4)
-        ret_dist = wavedec2(img_dist, wavelet, 'reflect', 4)
-        pyr_ref = {}
-        pyr_dist = {}
+        ret = wavedec2(img, wavelet, 'reflect', 4)
+        pyr = {}
         subband_keys = []
         for i in range(4):
-            pyr_ref[(3-i, 0)] = ret_ref[i+1][0]
-            pyr_ref[(3-i, 1)] = ret_ref[i+1][1]
-            pyr_dist[(3-i, 0)] = ret_dist[i+1][0]
-            pyr_dist[(3-i, 1)] = ret_dist[i+1][1]
+            pyr[(3-i, 0)] = ret[i+1][0]
+            pyr[(3-i, 1)] = ret[i+1][1]
             subband_keys.append((3-i, 0))
             subband_keys.append((3-i, 1))
-        pyr_ref[4] = ret_ref[0]
-        pyr_dist[4] = ret_dist[0]
+        pyr[4] = ret[0]
 
     subband_keys.reverse()
+    return pyr, subband_keys
+
+
+def vif(img_ref, img_dist, wavelet='steerable', full=False):
+    assert wavelet in ['steerable', 'haar', 'db2', 'bio2.2'], 'Invalid choice of wavelet'
+    M = 3
+    sigma_nsq = 0.1
+
+    pyr_ref, subband_keys = vif_pyramid(img_ref, wavelet)
+    pyr_dist, _ = vif_pyramid(img_dist, wavelet)
     n_subbands = len(subband_keys)
 
     [g_all, sigma_vsq_all] = vif_channel_est(pyr_ref, pyr_dist, subband_keys, M)
@@ -240,4 +242,44 @@ def msvif_spatial(img_ref, img_dist, k=11, sigma_nsq=0.1, stride=1, full=False):
     if full:
         return msvifval, nums, dens
     else:
-        return msvifval
\ No newline at end of file
+        return msvifval
+
+
+def block_pool(x, block):
+    m, n = (x.shape[0]//block)*block, (x.shape[1]//block)*block
+    if m == 0 or n == 0:
+        return np.array([[np.mean(x)]])
+    return x[:m, :n].reshape(m//block, block, n//block, block).mean(axis=(1, 3))
+
+
+def _rr_ratio(info_ref, info_dist):
+    # 1 when the information maps match, lower when information is lost or added
+    return (np.sum(np.minimum(info_ref, info_dist)) + 1e-4)/(np.sum(np.maximum(info_ref, info_dist)) + 1e-4)
+
+
+def vif_rr_features(img, wavelet='steerable', M=3, block=8):
+    pyr, subband_keys = vif_pyramid(img, wavelet)
+    [s_all, lamda_all] = vif_gsm_model(pyr, subband_keys, M)
+    return [block_pool(s, block) for s in s_all], lamda_all
+
+
+def vif_rr(s_ref, lamda_ref, s_dist, lamda_dist, sigma_nsq=0.1):
+    # reduced-reference VIF: compares the GSM information of each block of the
+    # reference and distorted subbands (features from vif_rr_features)
+    info_ref = []
+    info_dist = []
+    for i in range(len(s_ref)):
+        info_ref.append(np.sum(np.log(1 + s_ref[i][..., None]*lamda_ref[i]/sigma_nsq), -1).ravel())
+        info_dist.append(np.sum(np.log(1 + s_dist[i][..., None]*lamda_dist[i]/sigma_nsq), -1).ravel())
+    return _rr_ratio(np.concatenate(info_ref), np.concatenate(info_dist))
+
+
+def vif_spatial_rr_features(img, k=11, stride=1, block=16):
+    x = img.astype('float32')
+    _, _, var_x, _, _ = moments(x, x, k, stride)
+    return block_pool(var_x, block)
+
+
+def vif_spatial_rr(var_ref, var_dist, sigma_nsq=0.1):
+    # reduced-reference vif_spatial on pooled local variances (from vif_spatial_rr_features)
+    return _rr_ratio(np.log(1 + var_ref/sigma_nsq), np.log(1 + var_dist/sigma_nsq))